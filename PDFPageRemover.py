@@ -3,7 +3,9 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, ttk, simpledialog
 import os
 from PIL import Image, ImageTk
+import multiprocessing
 import threading
+from collections import OrderedDict
 
 from typing import Optional
 
@@ -251,7 +253,14 @@ class PDFImageProcessorPro:
         self.total_pages = 0
 
         self.page_thumbnails = []
-        self.canvas_images = []
+        # شبكة المصغرات الافتراضية: لا تُنشأ عناصر إلا للصفوف الظاهرة
+        self.visible_order = []  # display indices الظاهرة بالترتيب
+        self.thumb_slots = {}  # visible_index -> عناصر اللوحة المعروضة
+        self.free_thumb_slots = []  # عناصر جاهزة لإعادة الاستخدام
+        self.thumb_overscan_rows = 2
+        # PhotoImages جاهزة لكل مستوى تكبير {(page, zoom): (source_image, photo)}
+        self.thumb_photo_cache = OrderedDict()
+        self.thumb_photo_cache_size = 400
         self.selected_pages = set()
         self.page_order = []  # ترتيب الصفحات الحالي (0-based indices)
         self.page_rotations = {}  # زوايا التدوير لكل صفحة {page_index: angle}
@@ -267,15 +276,24 @@ class PDFImageProcessorPro:
         # متغيرات صور → PDF
         self.selected_images = []
         self.image_thumbnails = []
-        self.image_canvas_images = []
+        self.image_cells = []  # عناصر اللوحة لكل صورة بنفس ترتيب selected_images
+        # الصور المصغرة محسوبة مرة واحدة لكل ملف {(path, mtime, size): (image, photo)}
+        self.image_thumb_cache = OrderedDict()
+        self.image_thumb_cache_size = 1000
         self.selected_image_indices = set()  # فهارس الصور المحددة
         self.image_drag_data = {"item": None, "x": 0, "y": 0, "start_pos": None}  # بيانات السحب
         self.image_layout_var = tk.StringVar(value="one_per_page")  # طريقة الترتيب
         self.images_per_page_var = tk.StringVar(value="4")  # عدد الصور في الصفحة
+        self.image_dpi_var = tk.StringVar(value="auto")  # دقة الإخراج (auto أو رقم)
 
         # متغيرات استخراج صور
         self.export_format = tk.StringVar(value="png")
         self.export_dpi_var = tk.StringVar(value="600")
+        self.export_quality_var = tk.StringVar(value="85")  # جودة JPG
+        self.export_zip_var = tk.BooleanVar(value=False)  # الحفظ في ملف ZIP بدل مجلد
+        self.export_colorspace_var = tk.StringVar(value="rgb")  # rgb / gray / bilevel
+        self.export_dither_var = tk.BooleanVar(value=False)  # تنقيط للأبيض والأسود
+        self.export_alpha_var = tk.BooleanVar(value=False)  # خلفية شفافة (PNG فقط)
         self.export_pages_var = tk.StringVar(value="")
 
         # متغيرات دمج وتقسيم PDF
@@ -447,9 +465,14 @@ class PDFImageProcessorPro:
             scroll_frame, orient="vertical", command=self.canvas.yview
         )
         self.canvas.configure(
-            xscrollcommand=self.h_scrollbar.set, yscrollcommand=self.v_scrollbar.set
+            xscrollcommand=self.h_scrollbar.set, yscrollcommand=self.on_canvas_yscroll
         )
 
+        # ربط أحداث السحب والإفلات مرة واحدة لكل الصفحات
+        self.canvas.tag_bind("page", "<Button-1>", self.on_thumbnail_press)
+        self.canvas.tag_bind("page", "<B1-Motion>", self.on_drag_reorder)
+        self.canvas.tag_bind("page", "<ButtonRelease-1>", self.end_drag_reorder)
+
         self.h_scrollbar.pack(side="bottom", fill="x")
         self.v_scrollbar.pack(side="right", fill="y")
         self.canvas.pack(side="left", fill="both", expand=True)
@@ -868,6 +891,11 @@ class PDFImageProcessorPro:
         self.images_canvas.bind("<MouseWheel>", on_images_mousewheel)
         self.images_canvas.bind("<Enter>", lambda e: self.images_canvas.focus_set())
 
+        # ربط أحداث النقر والسحب مرة واحدة لكل عناصر الصور
+        self.images_canvas.tag_bind("image_cell", "<Button-1>", self.on_image_press)
+        self.images_canvas.tag_bind("image_cell", "<B1-Motion>", self.on_image_drag)
+        self.images_canvas.tag_bind("image_cell", "<ButtonRelease-1>", self.end_image_drag)
+
         action_frame = tk.Frame(self.tab2, bg="#1e293b")
         action_frame.pack(pady=8, fill="x", padx=20)
 
@@ -980,6 +1008,35 @@ class PDFImageProcessorPro:
         )
         self.custom_count_entry.pack(side="right", padx=5)
 
+        dpi_frame = tk.Frame(layout_frame, bg="#1e293b")
+        dpi_frame.pack(pady=(0, 10), padx=10, fill="x")
+
+        tk.Label(
+            dpi_frame,
+            text="🔍 DPI (الدقة):",
+            font=("Arial", 12, "bold"),
+            bg="#1e293b",
+            fg="#e5e7eb",
+        ).pack(side="right", padx=15)
+
+        tk.Entry(
+            dpi_frame,
+            textvariable=self.image_dpi_var,
+            font=("Arial", 11),
+            width=8,
+            bg="#1e293b",
+            fg="#e5e7eb",
+            insertbackground="#e5e7eb",
+        ).pack(side="right", padx=5)
+
+        tk.Label(
+            dpi_frame,
+            text="auto = حسب دقة كل صورة",
+            font=("Arial", 10),
+            bg="#1e293b",
+            fg="#9ca3af",
+        ).pack(side="right", padx=10)
+
         save_frame = tk.Frame(self.tab2, bg="#1e293b")
         save_frame.pack(pady=10, padx=20, fill="x")
 
@@ -1079,6 +1136,66 @@ class PDFImageProcessorPro:
             font=("Arial", 13, "bold"),
         ).pack(side="right", padx=10)
 
+        tk.Checkbutton(
+            format_frame,
+            text="📦 حفظ في ملف ZIP",
+            variable=self.export_zip_var,
+            bg="#1e293b",
+            fg="#e5e7eb",
+            selectcolor="#020617",
+            activebackground="#020617",
+            font=("Arial", 13, "bold"),
+        ).pack(side="right", padx=10)
+
+        color_frame = tk.Frame(options_frame, bg="#1e293b")
+        color_frame.pack(fill="x", pady=5)
+
+        tk.Label(
+            color_frame,
+            text="🎨 الألوان:",
+            font=("Arial", 13, "bold"),
+            bg="#1e293b",
+            fg="#e5e7eb",
+        ).pack(side="right", padx=10)
+
+        for text, value in (
+            ("ملون", "rgb"),
+            ("رمادي", "gray"),
+            ("أبيض وأسود", "bilevel"),
+        ):
+            tk.Radiobutton(
+                color_frame,
+                text=text,
+                variable=self.export_colorspace_var,
+                value=value,
+                bg="#1e293b",
+                fg="#e5e7eb",
+                selectcolor="#020617",
+                font=("Arial", 12, "bold"),
+            ).pack(side="right", padx=8)
+
+        tk.Checkbutton(
+            color_frame,
+            text="تنقيط (dither)",
+            variable=self.export_dither_var,
+            bg="#1e293b",
+            fg="#e5e7eb",
+            selectcolor="#020617",
+            activebackground="#020617",
+            font=("Arial", 12, "bold"),
+        ).pack(side="right", padx=8)
+
+        tk.Checkbutton(
+            color_frame,
+            text="خلفية شفافة (PNG)",
+            variable=self.export_alpha_var,
+            bg="#1e293b",
+            fg="#e5e7eb",
+            selectcolor="#020617",
+            activebackground="#020617",
+            font=("Arial", 12, "bold"),
+        ).pack(side="right", padx=8)
+
         dpi_frame = tk.Frame(options_frame, bg="#1e293b")
         dpi_frame.pack(fill="x", pady=5)
 
@@ -1100,6 +1217,24 @@ class PDFImageProcessorPro:
             insertbackground="#e5e7eb",
         ).pack(side="right", padx=10)
 
+        tk.Label(
+            dpi_frame,
+            text="🎚️ جودة JPG (1-100):",
+            font=("Arial", 13, "bold"),
+            bg="#1e293b",
+            fg="#e5e7eb",
+        ).pack(side="right", padx=10)
+
+        tk.Entry(
+            dpi_frame,
+            textvariable=self.export_quality_var,
+            font=("Arial", 12),
+            width=5,
+            bg="#1e293b",
+            fg="#e5e7eb",
+            insertbackground="#e5e7eb",
+        ).pack(side="right", padx=10)
+
         pages_frame = tk.Frame(options_frame, bg="#1e293b")
         pages_frame.pack(fill="x", pady=5)
 
@@ -1183,6 +1318,9 @@ class PDFImageProcessorPro:
     def load_pdf_thumbnails(self, file_path):
         try:
             self.progress.start(10)
+            # رقم جلسة التحميل لإيقاف التحميل القديم عند اختيار ملف جديد
+            self._thumb_load_id = getattr(self, "_thumb_load_id", 0) + 1
+            load_id = self._thumb_load_id
             self.selected_file = file_path
             self.root.after(
                 0,
@@ -1191,117 +1329,229 @@ class PDFImageProcessorPro:
                 ),
             )
 
-            self.page_thumbnails = pdf_ops.load_page_thumbnails(file_path, scale=0.25)
-            self.total_pages = len(self.page_thumbnails)
-            self.canvas_images.clear()
+            # حفظ التدوير الأصلي لكل صفحة
+            info = pdf_ops.probe(file_path)
+            self.total_pages = info["page_count"]
+            self.original_rotations = dict(enumerate(info["rotations"]))
+
+            # كل الصفحات موجودة في الترتيب من البداية (الحفظ والنقل يعملان أثناء
+            # التحميل)؛ الصفحات التي لم تصل صورتها تظهر خانة فارغة
+            self.page_thumbnails = [None] * self.total_pages
             self.selected_pages.clear()
             self.zoom_factor = 1.0
-            self.page_order = list(range(self.total_pages))  # تهيئة الترتيب
+            self.page_order = list(range(self.total_pages))
             self.page_rotations = {}  # إعادة تعيين التدويرات
-            
-            # حفظ التدوير الأصلي لكل صفحة
-            import fitz
-            doc = fitz.open(file_path)
-            self.original_rotations = {}
-            try:
-                for i in range(doc.page_count):
-                    page = doc.load_page(i)
-                    self.original_rotations[i] = page.rotation
-            finally:
-                doc.close()
-
+            self.root.after(0, self.thumb_photo_cache.clear)
             self.root.after(0, self.display_thumbnails)
+
+            # عرض الصفحات تدريجياً أثناء التحميل
+            batch = []
+            for page_index, img in pdf_ops.iter_page_thumbnails(file_path, scale=0.25):
+                if load_id != self._thumb_load_id:
+                    return
+                batch.append((page_index, img))
+                if len(batch) >= 4:
+                    self.root.after(0, self.fill_loaded_thumbnails, batch, load_id)
+                    batch = []
+
+            self.root.after(0, self.fill_loaded_thumbnails, batch, load_id)
+            self.root.after(0, self.progress.stop)
         except Exception as e:
             self.root.after(
                 0, lambda: show_custom_message(self.root, "خطأ", f"خطأ في تحميل:\n{str(e)}", "error")
             )
             self.root.after(0, self.progress.stop)
 
+    def fill_loaded_thumbnails(self, loaded, load_id):
+        """وضع صور الصفحات التي وصلت في خاناتها دون إعادة رسم الشبكة"""
+        if load_id != self._thumb_load_id:
+            return
+
+        for original_idx, img in loaded:
+            # صفحة دُوِّرت قبل وصول صورتها رُسمت مدورة بالفعل
+            if self.page_thumbnails[original_idx] is not None and self.page_rotations.get(original_idx, 0):
+                continue
+            self.page_thumbnails[original_idx] = img
+            self.refresh_page_thumbnail(original_idx)
+
     def display_thumbnails(self):
-        self.canvas.delete("all")
-        self.canvas_images.clear()
+        """إعادة بناء ترتيب العرض ورسم الصفوف الظاهرة فقط"""
+        hide = self.hide_deleted_var.get()
+        self.visible_order = [
+            display_idx
+            for display_idx, original_idx in enumerate(self.page_order)
+            if not (hide and original_idx in self.selected_pages)
+        ]
+
+        # كل العناصر تعود للمخزون ثم يُعاد ملء الظاهر منها
+        self.free_thumb_slots.extend(self.thumb_slots.values())
+        self.thumb_slots.clear()
+
+        self.update_thumbnails_scrollregion()
+        self.render_visible_thumbnails()
+
+        # إطار السحب يُرسم من جديد في موضع الصفحة المسحوبة فقط أثناء السحب
+        self.canvas.delete("drag_highlight")
+        if self.drag_data.get("item") is not None:
+            self.highlight_dragged_page(self.drag_data["item"])
+
+        self.pages_label.config(text=f"📄 الصفحات: {self.total_pages}")
+        if self.page_order:
+            self.save_btn.config(state="normal")
 
+    def thumbnail_grid(self):
+        """أبعاد الشبكة: (الأعمدة، عرض الخلية، ارتفاع الخلية، الهامش)"""
         cols = 4
         base_w = 180
         base_h = 250
         margin = 15
+        return cols, int(base_w * self.zoom_factor), int(base_h * self.zoom_factor), margin
 
-        thumb_width = int(base_w * self.zoom_factor)
-        thumb_height = int(base_h * self.zoom_factor)
-
-        visible_index = 0
-        for display_idx, original_idx in enumerate(self.page_order):
-            if self.hide_deleted_var.get() and original_idx in self.selected_pages:
-                continue
-
-            img = self.page_thumbnails[original_idx].copy()
-            
-            # لا نحتاج لتطبيق التدوير هنا لأن thumbnail أصبح مدوراً بالفعل من update_thumbnails_with_rotation
-
-            col = visible_index % cols
-            row = visible_index // cols
-            visible_index += 1
-
-            x = col * (thumb_width + margin) + margin
-            y = row * (thumb_height + margin) + margin
-
-            img_resized = img.resize(
-                (thumb_width - 20, thumb_height - 60), Image.Resampling.LANCZOS
-            )
-            photo = ImageTk.PhotoImage(img_resized)
-            self.canvas_images.append(photo)
-
-            frame_tag = f"frame_{display_idx}"
-            num_tag = f"num_{display_idx}"
-            img_tag = f"img_{display_idx}"
-
-            outline_color = "#ef4444" if original_idx in self.selected_pages else "#d1d5db"
-            outline_width = 4 if original_idx in self.selected_pages else 2
-
-            self.canvas.create_rectangle(
-                x,
-                y,
-                x + thumb_width,
-                y + thumb_height,
-                fill="#ffffff",
-                outline=outline_color,
-                width=outline_width,
-                tags=frame_tag,
-            )
-
-            self.canvas.create_text(
-                x + thumb_width // 2,
-                y + 15,
-                text=f"صفحة {original_idx + 1}",
-                font=("Arial", max(9, int(12 * self.zoom_factor)), "bold"),
-                fill="#111827",
-                tags=num_tag,
+    def update_thumbnails_scrollregion(self):
+        """حساب منطقة التمرير من عدد الصفوف دون الحاجة لرسم كل الصفحات"""
+        cols, thumb_width, thumb_height, margin = self.thumbnail_grid()
+        rows = (len(self.visible_order) + cols - 1) // cols
+        self.canvas.configure(
+            scrollregion=(
+                0,
+                0,
+                cols * (thumb_width + margin) + margin,
+                rows * (thumb_height + margin) + margin,
             )
+        )
 
-            self.canvas.create_image(
-                x + thumb_width // 2,
-                y + thumb_height // 2,
-                image=photo,
-                anchor="center",
-                tags=img_tag,
-            )
+    def on_canvas_yscroll(self, first, last):
+        """تحديث شريط التمرير ورسم الصفوف التي أصبحت ظاهرة"""
+        self.v_scrollbar.set(first, last)
+        self.render_visible_thumbnails()
+
+    def render_visible_thumbnails(self):
+        """رسم الصفوف الظاهرة (مع هامش صفوف إضافية) وإعادة استخدام العناصر الخارجة منها"""
+        cols, thumb_width, thumb_height, margin = self.thumbnail_grid()
+        row_height = thumb_height + margin
+
+        top = self.canvas.canvasy(0)
+        bottom = self.canvas.canvasy(self.canvas.winfo_height())
+        first_row = max(0, int(top // row_height) - self.thumb_overscan_rows)
+        last_row = int(bottom // row_height) + self.thumb_overscan_rows
+        first = first_row * cols
+        last = min(len(self.visible_order), (last_row + 1) * cols)
+
+        for visible_index in list(self.thumb_slots):
+            if not first <= visible_index < last:
+                self.free_thumb_slots.append(self.thumb_slots.pop(visible_index))
+
+        for visible_index in range(first, last):
+            display_idx = self.visible_order[visible_index]
+            original_idx = self.page_order[display_idx]
+            slot = self.thumb_slots.get(visible_index)
+            if slot is not None and slot["page"] == original_idx:
+                continue
+            if slot is None:
+                slot = self.free_thumb_slots.pop() if self.free_thumb_slots else self.create_thumb_slot()
+                self.thumb_slots[visible_index] = slot
+            self.fill_thumb_slot(slot, visible_index, original_idx)
+
+        for slot in self.free_thumb_slots:
+            if slot["page"] is not None:
+                slot["page"] = None
+                for item in slot["items"]:
+                    self.canvas.itemconfig(item, state="hidden")
+
+    def create_thumb_slot(self):
+        """إنشاء مجموعة عناصر (إطار، رقم، صورة) تُعاد تعبئتها عند التمرير"""
+        frame = self.canvas.create_rectangle(0, 0, 0, 0, fill="#ffffff", tags="page")
+        num = self.canvas.create_text(0, 0, fill="#111827", tags="page")
+        img = self.canvas.create_image(0, 0, anchor="center", tags="page")
+        return {"items": (frame, num, img), "page": None, "photo": None}
+
+    def fill_thumb_slot(self, slot, visible_index: int, original_idx: int):
+        """وضع صفحة في خانة من الشبكة"""
+        cols, thumb_width, thumb_height, margin = self.thumbnail_grid()
+        frame, num, img_item = slot["items"]
+
+        col = visible_index % cols
+        row = visible_index // cols
+        x = col * (thumb_width + margin) + margin
+        y = row * (thumb_height + margin) + margin
+
+        photo = self.get_thumbnail_photo(original_idx)
+        slot["photo"] = photo
+
+        self.canvas.coords(frame, x, y, x + thumb_width, y + thumb_height)
+        self.style_thumb_frame(slot, original_idx)
+        self.canvas.coords(num, x + thumb_width // 2, y + 15)
+        self.canvas.itemconfig(
+            num,
+            text=f"صفحة {original_idx + 1}",
+            font=("Arial", max(9, int(12 * self.zoom_factor)), "bold"),
+            state="normal",
+        )
+        self.canvas.coords(img_item, x + thumb_width // 2, y + thumb_height // 2)
+        self.canvas.itemconfig(img_item, image=photo, state="normal")
+        slot["page"] = original_idx
+
+    def style_thumb_frame(self, slot, original_idx: int):
+        """تلوين إطار الصفحة حسب حالة التحديد"""
+        selected = original_idx in self.selected_pages
+        self.canvas.itemconfig(
+            slot["items"][0],
+            outline="#ef4444" if selected else "#d1d5db",
+            width=4 if selected else 2,
+            state="normal",
+        )
 
-            # ربط أحداث السحب والإفلات
-            for tag in (frame_tag, num_tag, img_tag):
-                self.canvas.tag_bind(
-                    tag,
-                    "<Button-1>",
-                    lambda e, idx=display_idx, orig=original_idx: self.start_drag_reorder(
-                        e, idx, orig
-                    ),
-                )
-                self.canvas.tag_bind(tag, "<B1-Motion>", self.on_drag_reorder)
-                self.canvas.tag_bind(tag, "<ButtonRelease-1>", self.end_drag_reorder)
+    def get_thumbnail_photo(self, original_idx: int):
+        """PhotoImage للصفحة بحجم التكبير الحالي (من الذاكرة المؤقتة إن وجدت)"""
+        # لا نحتاج لتطبيق التدوير هنا لأن thumbnail أصبح مدوراً بالفعل من update_thumbnails_with_rotation
+        source = self.page_thumbnails[original_idx]
+        if source is None:
+            return ""  # لم تصل صورة الصفحة بعد
+        key = (original_idx, self.zoom_factor)
+        cached = self.thumb_photo_cache.get(key)
+        if cached is not None and cached[0] is source:
+            self.thumb_photo_cache.move_to_end(key)
+            return cached[1]
+
+        _, thumb_width, thumb_height, _ = self.thumbnail_grid()
+        img_resized = source.resize(
+            (thumb_width - 20, thumb_height - 60), Image.Resampling.LANCZOS
+        )
+        photo = ImageTk.PhotoImage(img_resized)
+        self.thumb_photo_cache[key] = (source, photo)
+        while len(self.thumb_photo_cache) > self.thumb_photo_cache_size:
+            self.thumb_photo_cache.popitem(last=False)
+        return photo
+
+    def find_thumb_slot(self, original_idx: int):
+        """الخانة المعروضة حالياً لصفحة معينة (أو None إن لم تكن ظاهرة)"""
+        for slot in self.thumb_slots.values():
+            if slot["page"] == original_idx:
+                return slot
+        return None
 
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        self.pages_label.config(text=f"📄 الصفحات: {self.total_pages}")
-        self.save_btn.config(state="normal")
-        self.progress.stop()
+    def refresh_selection_styles(self):
+        """تحديث ألوان الإطارات الظاهرة فقط بعد تغيير التحديد"""
+        if self.hide_deleted_var.get():
+            # الصفحات المحددة تختفي، لذا يتغير ترتيب الشبكة
+            self.display_thumbnails()
+            return
+        for slot in self.thumb_slots.values():
+            self.style_thumb_frame(slot, slot["page"])
+
+    def refresh_page_thumbnail(self, original_idx: int):
+        """استبدال صورة صفحة واحدة بعد تغييرها (مثل التدوير)"""
+        slot = self.find_thumb_slot(original_idx)
+        if slot is not None:
+            photo = self.get_thumbnail_photo(original_idx)
+            slot["photo"] = photo
+            self.canvas.itemconfig(slot["items"][2], image=photo)
+
+    def on_thumbnail_press(self, event):
+        """نقر على صفحة: تحديد الصفحة حسابياً من موضع النقر"""
+        display_idx = self.get_page_at_position(event.x, event.y)
+        if display_idx is not None:
+            self.start_drag_reorder(event, display_idx, self.page_order[display_idx])
 
     def start_drag_reorder(self, event, display_idx: int, original_idx: int):
         """بدء السحب لإعادة الترتيب"""
@@ -1341,6 +1591,9 @@ class PDFImageProcessorPro:
                 if dx < 5 and dy < 5:
                     # نقر عادي - تبديل التحديد
                     display_idx = self.drag_data["item"]
+                    self.drag_data["item"] = None
+                    self.drag_data["start_pos"] = None
+                    self.canvas.delete("drag_highlight")
                     if display_idx < len(self.page_order):
                         original_idx = self.page_order[display_idx]
                         self.toggle_selection(original_idx)
@@ -1353,65 +1606,44 @@ class PDFImageProcessorPro:
 
     def get_page_at_position(self, x, y):
         """الحصول على رقم الصفحة في الموضع المحدد (display index)"""
+        canvas_x = self.canvas.canvasx(x)
         canvas_y = self.canvas.canvasy(y)
-        cols = 4
-        base_w = 180
-        base_h = 250
-        margin = 15
+        cols, thumb_width, thumb_height, margin = self.thumbnail_grid()
 
-        thumb_width = int(base_w * self.zoom_factor)
-        thumb_height = int(base_h * self.zoom_factor)
+        col = int((canvas_x - margin) // (thumb_width + margin))
+        row = int((canvas_y - margin) // (thumb_height + margin))
 
-        col = int((x - margin) / (thumb_width + margin))
-        row = int((canvas_y - margin) / (thumb_height + margin))
-
-        if col < 0 or col >= cols:
+        if col < 0 or col >= cols or row < 0:
             return None
 
         # حساب display index مع مراعاة الصفحات المخفية
         visible_index = row * cols + col
-        visible_count = 0
-        for display_idx, original_idx in enumerate(self.page_order):
-            if self.hide_deleted_var.get() and original_idx in self.selected_pages:
-                continue
-            if visible_count == visible_index:
-                return display_idx
-            visible_count += 1
-
+        if visible_index < len(self.visible_order):
+            return self.visible_order[visible_index]
         return None
 
     def highlight_dragged_page(self, display_idx: int):
         """تمييز صفحة مسحوبة"""
-        cols = 4
-        base_w = 180
-        base_h = 250
-        margin = 15
-
-        thumb_width = int(base_w * self.zoom_factor)
-        thumb_height = int(base_h * self.zoom_factor)
+        if display_idx not in self.visible_order:
+            return
+        cols, thumb_width, thumb_height, margin = self.thumbnail_grid()
 
         # حساب موضع الصفحة
-        visible_count = 0
-        for idx, original_idx in enumerate(self.page_order):
-            if self.hide_deleted_var.get() and original_idx in self.selected_pages:
-                continue
-            if idx == display_idx:
-                col = visible_count % cols
-                row = visible_count // cols
-                x = col * (thumb_width + margin) + margin
-                y = row * (thumb_height + margin) + margin
-
-                self.canvas.create_rectangle(
-                    x - 5,
-                    y - 5,
-                    x + thumb_width + 5,
-                    y + thumb_height + 5,
-                    outline="#2563eb",
-                    width=4,
-                    tags="drag_highlight",
-                )
-                break
-            visible_count += 1
+        visible_index = self.visible_order.index(display_idx)
+        col = visible_index % cols
+        row = visible_index // cols
+        x = col * (thumb_width + margin) + margin
+        y = row * (thumb_height + margin) + margin
+
+        self.canvas.create_rectangle(
+            x - 5,
+            y - 5,
+            x + thumb_width + 5,
+            y + thumb_height + 5,
+            outline="#2563eb",
+            width=4,
+            tags="drag_highlight",
+        )
 
     def toggle_selection(self, page_idx: int):
         """تبديل تحديد صفحة (نقر عادي)"""
@@ -1421,7 +1653,12 @@ class PDFImageProcessorPro:
             self.selected_pages.add(page_idx)
 
         self.update_selection_count()
-        self.display_thumbnails()
+        if self.hide_deleted_var.get():
+            self.display_thumbnails()
+            return
+        slot = self.find_thumb_slot(page_idx)
+        if slot is not None:
+            self.style_thumb_frame(slot, page_idx)
 
     def update_selection_count(self):
         self.selected_label.config(
@@ -1431,29 +1668,29 @@ class PDFImageProcessorPro:
     def select_all_delete(self):
         self.selected_pages = set(range(self.total_pages))
         self.update_selection_count()
-        self.display_thumbnails()
+        self.refresh_selection_styles()
 
     def clear_all_selection(self):
         self.selected_pages.clear()
         self.update_selection_count()
-        self.display_thumbnails()
+        self.refresh_selection_styles()
 
     def invert_selection(self):
         self.selected_pages = {
             i for i in range(self.total_pages) if i not in self.selected_pages
         }
         self.update_selection_count()
-        self.display_thumbnails()
+        self.refresh_selection_styles()
 
     def select_even_pages(self):
         self.selected_pages = {i for i in range(self.total_pages) if (i + 1) % 2 == 0}
         self.update_selection_count()
-        self.display_thumbnails()
+        self.refresh_selection_styles()
 
     def select_odd_pages(self):
         self.selected_pages = {i for i in range(self.total_pages) if (i + 1) % 2 == 1}
         self.update_selection_count()
-        self.display_thumbnails()
+        self.refresh_selection_styles()
 
     def zoom_in(self):
         if self.zoom_factor < self.max_zoom:
@@ -1494,46 +1731,18 @@ class PDFImageProcessorPro:
     def update_thumbnails_with_rotation(self, pages_to_rotate):
         """تحديث thumbnails مع التدوير"""
         try:
-            import fitz
-            doc = fitz.open(self.selected_file)
-            try:
-                for page_idx in pages_to_rotate:
-                    if 0 <= page_idx < doc.page_count:
-                        page = doc.load_page(page_idx)
-                        rotation_angle = self.page_rotations.get(page_idx, 0)
-                        # نطبق التدوير المطلق (التدوير الأصلي + التدوير الإضافي)
-                        original_rotation = self.original_rotations.get(page_idx, 0)
-                        total_rotation = (original_rotation + rotation_angle) % 360
-                        page.set_rotation(total_rotation)
-                        # إعادة تحميل thumbnail
-                        mat = fitz.Matrix(0.25, 0.25)
-                        pix = page.get_pixmap(matrix=mat)
-                        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                        self.page_thumbnails[page_idx] = img
-            finally:
-                doc.close()
-            
-            # تحديث العرض
-            self.root.after(0, self.display_thumbnails)
+            # التدوير الإضافي فوق التدوير الأصلي للصفحة (يُخزَّن مؤقتاً حسب الزاوية)
+            pages = [p for p in pages_to_rotate if 0 <= p < len(self.page_thumbnails)]
+            rotations = {p: self.page_rotations.get(p, 0) for p in pages}
+            for page_idx, img in pdf_ops.iter_page_thumbnails(
+                self.selected_file, scale=0.25, pages=pages, rotations=rotations
+            ):
+                self.page_thumbnails[page_idx] = img
+                # استبدال صورة الصفحة فقط دون إعادة رسم الشبكة
+                self.root.after(0, self.refresh_page_thumbnail, page_idx)
         except Exception as e:
             self.root.after(0, lambda: show_custom_message(self.root, "❌ خطأ", f"خطأ في التدوير:\n{str(e)}", "error"))
 
-    def apply_rotations_to_pdf(self, pdf_path: str, output_path: str, page_rotations: dict):
-        """تطبيق التدويرات على PDF عند الحفظ"""
-        import fitz
-        doc = fitz.open(pdf_path)
-        try:
-            for page_idx, angle in page_rotations.items():
-                if 0 <= page_idx < doc.page_count:
-                    page = doc.load_page(page_idx)
-                    # نطبق التدوير المطلق (التدوير الأصلي + التدوير الإضافي)
-                    original_rotation = self.original_rotations.get(page_idx, 0) if hasattr(self, 'original_rotations') else 0
-                    total_rotation = (original_rotation + angle) % 360
-                    page.set_rotation(total_rotation)
-            doc.save(output_path)
-        finally:
-            doc.close()
-
     def save_selected_pages(self):
         if not self.selected_pages:
             show_custom_message(self.root, "تحذير", "اختر صفحات أولاً!", "warning")
@@ -1613,27 +1822,13 @@ class PDFImageProcessorPro:
     def process_reorder_pdf(self, output_path: str):
         try:
             self.progress.start()
-            
-            # حفظ في ملف مؤقت أولاً
-            import tempfile
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-            temp_path = temp_file.name
-            temp_file.close()
-            
-            pdf_ops.reorder_pages(self.selected_file, self.page_order, temp_path)
-            
-            # تطبيق التدويرات إذا كانت موجودة
-            if self.page_rotations:
-                # إعادة ترتيب التدويرات حسب الترتيب الجديد
-                reordered_rotations = {}
-                for new_idx, old_idx in enumerate(self.page_order):
-                    if old_idx in self.page_rotations:
-                        reordered_rotations[new_idx] = self.page_rotations[old_idx]
-                self.apply_rotations_to_pdf(temp_path, output_path, reordered_rotations)
-            else:
-                import shutil
-                shutil.move(temp_path, output_path)
-            
+
+            # تطبيق الترتيب والتدويرات في مرور واحد
+            plan = pdf_ops.EditPlan(
+                page_order=list(self.page_order), rotations=dict(self.page_rotations)
+            )
+            pdf_ops.apply_edit_plan(self.selected_file, plan, output_path)
+
             self.root.after(0, self.progress.stop)
             self.root.after(
                 0,
@@ -1719,12 +1914,9 @@ class PDFImageProcessorPro:
         if not file_path:
             return
 
-        # فتح الملف لمعرفة عدد الصفحات
+        # قراءة عدد الصفحات دون فتح الملف للرسم
         try:
-            import fitz
-            temp_doc = fitz.open(file_path)
-            total_pages_in_file = temp_doc.page_count
-            temp_doc.close()
+            total_pages_in_file = pdf_ops.probe(file_path)["page_count"]
         except Exception as e:
             show_custom_message(self.root, "خطأ", f"خطأ في قراءة الملف:\n{str(e)}", "error")
             return
@@ -1803,73 +1995,86 @@ class PDFImageProcessorPro:
         selection_canvas.pack(side="left", fill="both", expand=True)
 
         # تحميل المصغرات
+        canvas_images = []
+        selection_canvas.canvas_images = canvas_images
+        closed = [False]
+
+        def toggle_selection(idx):
+            if idx in selected_pages:
+                selected_pages.remove(idx)
+                selection_canvas.itemconfig(f"rect_{idx}", outline="#d1d5db", width=2)
+            else:
+                selected_pages.add(idx)
+                selection_canvas.itemconfig(f"rect_{idx}", outline="#3b82f6", width=4)
+
+        def draw_page(i, thumbnail):
+            if closed[0]:
+                return
+
+            cols = 4
+            thumb_width = 150
+            thumb_height = 200
+            margin = 10
+
+            col = i % cols
+            row = i // cols
+
+            x = col * (thumb_width + margin) + margin
+            y = row * (thumb_height + margin) + margin
+
+            img_resized = thumbnail.resize(
+                (thumb_width - 20, thumb_height - 40), Image.Resampling.LANCZOS
+            )
+            photo = ImageTk.PhotoImage(img_resized)
+            canvas_images.append(photo)
+
+            # إطار الصفحة
+            rect_tag = f"rect_{i}"
+            selection_canvas.create_rectangle(
+                x, y, x + thumb_width, y + thumb_height,
+                fill="#ffffff",
+                outline="#3b82f6" if i in selected_pages else "#d1d5db",
+                width=4 if i in selected_pages else 2,
+                tags=(rect_tag, "page_item")
+            )
+
+            # الصورة
+            img_tag = f"img_{i}"
+            selection_canvas.create_image(
+                x + thumb_width // 2, y + 30,
+                image=photo, anchor="center",
+                tags=(img_tag, "page_item")
+            )
+
+            # رقم الصفحة
+            text_tag = f"text_{i}"
+            selection_canvas.create_text(
+                x + thumb_width // 2, y + thumb_height - 20,
+                text=f"صفحة {i + 1}",
+                font=("Arial", 10, "bold"),
+                fill="#1e293b",
+                tags=(text_tag, "page_item")
+            )
+
+            # ربط النقر
+            for tag in [rect_tag, img_tag, text_tag]:
+                selection_canvas.tag_bind(
+                    tag, "<Button-1>", lambda e, idx=i: toggle_selection(idx)
+                )
+
+            selection_canvas.configure(scrollregion=selection_canvas.bbox("all"))
+
         def load_thumbnails():
             try:
-                thumbnails = pdf_ops.load_page_thumbnails(file_path, scale=0.15)
-                canvas_images = []
-
-                cols = 4
-                thumb_width = 150
-                thumb_height = 200
-                margin = 10
-
-                for i, thumbnail in enumerate(thumbnails):
-                    col = i % cols
-                    row = i // cols
-
-                    x = col * (thumb_width + margin) + margin
-                    y = row * (thumb_height + margin) + margin
-
-                    img_resized = thumbnail.resize(
-                        (thumb_width - 20, thumb_height - 40), Image.Resampling.LANCZOS
-                    )
-                    photo = ImageTk.PhotoImage(img_resized)
-                    canvas_images.append(photo)
-
-                    # إطار الصفحة
-                    rect_tag = f"rect_{i}"
-                    selection_canvas.create_rectangle(
-                        x, y, x + thumb_width, y + thumb_height,
-                        fill="#ffffff", outline="#d1d5db", width=2,
-                        tags=(rect_tag, "page_item")
-                    )
-
-                    # الصورة
-                    img_tag = f"img_{i}"
-                    selection_canvas.create_image(
-                        x + thumb_width // 2, y + 30,
-                        image=photo, anchor="center",
-                        tags=(img_tag, "page_item")
-                    )
-
-                    # رقم الصفحة
-                    text_tag = f"text_{i}"
-                    selection_canvas.create_text(
-                        x + thumb_width // 2, y + thumb_height - 20,
-                        text=f"صفحة {i + 1}",
-                        font=("Arial", 10, "bold"),
-                        fill="#1e293b",
-                        tags=(text_tag, "page_item")
-                    )
-
-                    # ربط النقر
-                    def toggle_selection(idx):
-                        if idx in selected_pages:
-                            selected_pages.remove(idx)
-                            selection_canvas.itemconfig(f"rect_{idx}", outline="#d1d5db", width=2)
-                        else:
-                            selected_pages.add(idx)
-                            selection_canvas.itemconfig(f"rect_{idx}", outline="#3b82f6", width=4)
-
-                    for tag in [rect_tag, img_tag, text_tag]:
-                        selection_canvas.tag_bind(
-                            tag, "<Button-1>", lambda e, idx=i: toggle_selection(idx)
-                        )
-
-                selection_canvas.configure(scrollregion=selection_canvas.bbox("all"))
-                selection_canvas.canvas_images = canvas_images
+                # عرض كل صفحة فور تجهيزها
+                for i, thumbnail in pdf_ops.iter_page_thumbnails(file_path, scale=0.15):
+                    if closed[0]:
+                        return
+                    self.root.after(0, draw_page, i, thumbnail)
             except Exception as e:
-                show_custom_message(self.root, "خطأ", f"خطأ في تحميل الصفحات:\n{str(e)}", "error")
+                self.root.after(
+                    0, show_custom_message, self.root, "خطأ", f"خطأ في تحميل الصفحات:\n{str(e)}", "error"
+                )
 
         threading.Thread(target=load_thumbnails, daemon=True).start()
 
@@ -1945,6 +2150,7 @@ class PDFImageProcessorPro:
         ).pack(side="left", padx=5)
 
         selection_window.wait_window()
+        closed[0] = True
         return result[0]
 
     def process_add_pages_from_pdf(self, insert_pdf_path: str, insert_at: int, temp_path: str, pages_to_insert: list = None):
@@ -2161,95 +2367,121 @@ class PDFImageProcessorPro:
             selected_pages_in_preview.clear()
             refresh_preview()
 
+        thumbnails = {}  # الصفحات المحملة {original_idx: image}
+        canvas_images = []
+        preview_canvas.canvas_images = canvas_images
+        closed = [False]
+
+        def draw_preview_page(display_idx, original_idx):
+            """رسم صفحة واحدة في موضعها من الشبكة"""
+            cols = 3
+            base_w = 200
+            base_h = 280
+            margin = 15
+
+            col = display_idx % cols
+            row = display_idx // cols
+
+            x = col * (base_w + margin) + margin
+            y = row * (base_h + margin) + margin
+
+            img = thumbnails[original_idx]
+            img_resized = img.resize(
+                (base_w - 20, base_h - 60), Image.Resampling.LANCZOS
+            )
+            photo = ImageTk.PhotoImage(img_resized)
+            canvas_images.append(photo)
+
+            # حفظ tags لكل عنصر
+            rect_tag = f"rect_{display_idx}"
+            text_tag = f"text_{display_idx}"
+            img_tag = f"img_{display_idx}"
+
+            # تحديد لون الإطار حسب التحديد
+            outline_color = "#3b82f6" if display_idx in selected_pages_in_preview else "#d1d5db"
+            outline_width = 4 if display_idx in selected_pages_in_preview else 2
+
+            preview_canvas.create_rectangle(
+                x,
+                y,
+                x + base_w,
+                y + base_h,
+                fill="#ffffff",
+                outline=outline_color,
+                width=outline_width,
+                tags=(rect_tag, "page"),
+            )
+
+            preview_canvas.create_text(
+                x + base_w // 2,
+                y + 15,
+                text=f"صفحة {original_idx + 1}",
+                font=("Arial", 11, "bold"),
+                fill="#111827",
+                tags=(text_tag, "page"),
+            )
+
+            preview_canvas.create_image(
+                x + base_w // 2,
+                y + base_h // 2,
+                image=photo,
+                anchor="center",
+                tags=(img_tag, "page"),
+            )
+
+            # ربط أحداث النقر للتحديد (Ctrl+Click) والسحب
+            def on_page_click(event, idx=display_idx):
+                if event.state & 0x4:  # Ctrl key
+                    toggle_page_selection(idx)
+                else:
+                    start_drag(event)
+
+            for tag in (rect_tag, text_tag, img_tag):
+                preview_canvas.tag_bind(tag, "<Button-1>", on_page_click)
+                preview_canvas.tag_bind(tag, "<B1-Motion>", on_drag)
+                preview_canvas.tag_bind(tag, "<ButtonRelease-1>", end_drag)
+
         def refresh_preview():
             """تحديث عرض الصفحات حسب الترتيب الجديد"""
             preview_canvas.delete("all")
+            canvas_images.clear()
             try:
-                thumbnails = pdf_ops.load_page_thumbnails(preview_pdf_path, scale=0.2)
-                canvas_images = []
-
-                cols = 3
-                base_w = 200
-                base_h = 280
-                margin = 15
-
-                # عرض الصفحات غير المحذوفة فقط
+                # عرض الصفحات غير المحذوفة فقط (المحملة حتى الآن)
                 visible_pages = [idx for idx in page_order if idx not in deleted_pages]
 
                 for display_idx, original_idx in enumerate(visible_pages):
-                    col = display_idx % cols
-                    row = display_idx // cols
-
-                    x = col * (base_w + margin) + margin
-                    y = row * (base_h + margin) + margin
-
-                    img = thumbnails[original_idx]
-                    img_resized = img.resize(
-                        (base_w - 20, base_h - 60), Image.Resampling.LANCZOS
-                    )
-                    photo = ImageTk.PhotoImage(img_resized)
-                    canvas_images.append(photo)
-
-                    # حفظ tags لكل عنصر
-                    rect_tag = f"rect_{display_idx}"
-                    text_tag = f"text_{display_idx}"
-                    img_tag = f"img_{display_idx}"
-
-                    # تحديد لون الإطار حسب التحديد
-                    outline_color = "#3b82f6" if display_idx in selected_pages_in_preview else "#d1d5db"
-                    outline_width = 4 if display_idx in selected_pages_in_preview else 2
-
-                    preview_canvas.create_rectangle(
-                        x,
-                        y,
-                        x + base_w,
-                        y + base_h,
-                        fill="#ffffff",
-                        outline=outline_color,
-                        width=outline_width,
-                        tags=(rect_tag, "page"),
-                    )
-
-                    preview_canvas.create_text(
-                        x + base_w // 2,
-                        y + 15,
-                        text=f"صفحة {original_idx + 1}",
-                        font=("Arial", 11, "bold"),
-                        fill="#111827",
-                        tags=(text_tag, "page"),
-                    )
-
-                    preview_canvas.create_image(
-                        x + base_w // 2,
-                        y + base_h // 2,
-                        image=photo,
-                        anchor="center",
-                        tags=(img_tag, "page"),
-                    )
-
-                    # ربط أحداث النقر للتحديد (Ctrl+Click) والسحب
-                    def on_page_click(event, idx=display_idx):
-                        if event.state & 0x4:  # Ctrl key
-                            toggle_page_selection(idx)
-                        else:
-                            start_drag(event)
-
-                    for tag in (rect_tag, text_tag, img_tag):
-                        preview_canvas.tag_bind(tag, "<Button-1>", on_page_click)
-                        preview_canvas.tag_bind(tag, "<B1-Motion>", on_drag)
-                        preview_canvas.tag_bind(tag, "<ButtonRelease-1>", end_drag)
+                    if original_idx in thumbnails:
+                        draw_preview_page(display_idx, original_idx)
 
                 preview_canvas.configure(scrollregion=preview_canvas.bbox("all"))
-                preview_canvas.canvas_images = canvas_images
             except Exception as e:
                 messagebox.showerror("خطأ", f"خطأ في تحديث المعاينة:\n{str(e)}")
 
+        def on_page_loaded(original_idx):
+            """رسم الصفحة فور وصولها من التحميل"""
+            if not preview_canvas.winfo_exists():
+                closed[0] = True
+                return
+            if original_idx in deleted_pages or original_idx not in page_order:
+                return
+            # الموضع داخل الصفحات الظاهرة كما في refresh_preview، لا داخل page_order
+            # (الذي ما زال يحتوي الصفحات المحذوفة)
+            visible_pages = [idx for idx in page_order if idx not in deleted_pages]
+            draw_preview_page(visible_pages.index(original_idx), original_idx)
+            preview_canvas.configure(scrollregion=preview_canvas.bbox("all"))
+
         # تحميل الصور المصغرة في Thread
         def load_preview_thumbnails():
             try:
-                refresh_preview()
+                for page_index, img in pdf_ops.iter_page_thumbnails(preview_pdf_path, scale=0.2):
+                    if closed[0]:
+                        return
+                    thumbnails[page_index] = img
+                    self.root.after(0, on_page_loaded, page_index)
             except Exception as e:
-                messagebox.showerror("خطأ", f"خطأ في تحميل المعاينة:\n{str(e)}")
+                self.root.after(
+                    0, messagebox.showerror, "خطأ", f"خطأ في تحميل المعاينة:\n{str(e)}"
+                )
 
         threading.Thread(target=load_preview_thumbnails, daemon=True).start()
 
@@ -2766,8 +2998,14 @@ class PDFImageProcessorPro:
             self.original_rotations = {}
         if hasattr(self, "canvas"):
             self.canvas.delete("all")
+            self.thumb_photo_cache.clear()
+            self.thumb_slots.clear()
+            self.free_thumb_slots.clear()
+            self.visible_order = []
         if hasattr(self, "page_labels"):
             self.page_labels.clear()
+        if hasattr(self, "_thumb_load_id"):
+            self._thumb_load_id += 1  # إيقاف أي تحميل جارٍ
         if hasattr(self, "page_thumbnails"):
             self.page_thumbnails.clear()
         if hasattr(self, "total_pages"):
@@ -2786,8 +3024,8 @@ class PDFImageProcessorPro:
             self.images_label.config(text="لم يتم اختيار صور", fg="#9ca3af")
         if hasattr(self, "images_canvas"):
             self.images_canvas.delete("all")
-        if hasattr(self, "image_canvas_images"):
-            self.image_canvas_images.clear()
+        if hasattr(self, "image_cells"):
+            self.image_cells.clear()
 
     def clear_tab3_fields(self):
         """مسح حقول تبويب استخراج صور بعد النجاح"""
@@ -2799,6 +3037,16 @@ class PDFImageProcessorPro:
             self.export_pages_label.config(text="📄 الصفحات: 0")
         if hasattr(self, "export_dpi_var"):
             self.export_dpi_var.set("600")
+        if hasattr(self, "export_quality_var"):
+            self.export_quality_var.set("85")
+        if hasattr(self, "export_zip_var"):
+            self.export_zip_var.set(False)
+        if hasattr(self, "export_colorspace_var"):
+            self.export_colorspace_var.set("rgb")
+        if hasattr(self, "export_dither_var"):
+            self.export_dither_var.set(False)
+        if hasattr(self, "export_alpha_var"):
+            self.export_alpha_var.set(False)
         if hasattr(self, "export_pages_var"):
             self.export_pages_var.set("")
         if hasattr(self, "export_format_var"):
@@ -2865,28 +3113,12 @@ class PDFImageProcessorPro:
     def process_and_save_selected(self, output_path: str, pages_to_keep):
         try:
             self.progress.start()
-            
-            # حفظ في ملف مؤقت أولاً
-            import tempfile
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-            temp_path = temp_file.name
-            temp_file.close()
-
-            kept_count = pdf_ops.extract_pages(
-                self.selected_file, pages_to_keep, temp_path
+
+            # الاحتفاظ بالصفحات المحددة مع التدويرات في مرور واحد
+            plan = pdf_ops.EditPlan(
+                page_order=sorted(set(pages_to_keep)), rotations=dict(self.page_rotations)
             )
-            
-            # تطبيق التدويرات إذا كانت موجودة
-            if self.page_rotations:
-                # إعادة ترتيب التدويرات حسب الصفحات المحفوظة
-                kept_rotations = {}
-                for new_idx, old_idx in enumerate(sorted(pages_to_keep)):
-                    if old_idx in self.page_rotations:
-                        kept_rotations[new_idx] = self.page_rotations[old_idx]
-                self.apply_rotations_to_pdf(temp_path, output_path, kept_rotations)
-            else:
-                import shutil
-                shutil.move(temp_path, output_path)
+            kept_count = pdf_ops.apply_edit_plan(self.selected_file, plan, output_path)
 
             self.root.after(0, self.progress.stop)
             self.root.after(
@@ -2905,29 +3137,13 @@ class PDFImageProcessorPro:
     def process_and_save(self, output_path: str, pages_to_delete):
         try:
             self.progress.start()
-            
-            # حفظ في ملف مؤقت أولاً
-            import tempfile
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-            temp_path = temp_file.name
-            temp_file.close()
-
-            deleted_count = pdf_ops.delete_pages(
-                self.selected_file, pages_to_delete, temp_path
+
+            # حذف الصفحات وتطبيق التدويرات في مرور واحد
+            plan = pdf_ops.EditPlan(
+                deleted=set(pages_to_delete), rotations=dict(self.page_rotations)
             )
-            
-            # تطبيق التدويرات إذا كانت موجودة
-            if self.page_rotations:
-                # إعادة ترتيب التدويرات بعد الحذف
-                remaining_rotations = {}
-                pages_to_keep = [i for i in range(self.total_pages) if i not in pages_to_delete]
-                for new_idx, old_idx in enumerate(pages_to_keep):
-                    if old_idx in self.page_rotations:
-                        remaining_rotations[new_idx] = self.page_rotations[old_idx]
-                self.apply_rotations_to_pdf(temp_path, output_path, remaining_rotations)
-            else:
-                import shutil
-                shutil.move(temp_path, output_path)
+            remaining = pdf_ops.apply_edit_plan(self.selected_file, plan, output_path)
+            deleted_count = self.total_pages - remaining
 
             self.root.after(0, self.progress.stop)
             self.root.after(
@@ -2963,21 +3179,10 @@ class PDFImageProcessorPro:
     def compress_and_save(self, output_path: str):
         try:
             self.progress.start()
-            
-            # حفظ في ملف مؤقت أولاً
-            import tempfile
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-            temp_path = temp_file.name
-            temp_file.close()
 
-            pdf_ops.compress_pdf(self.selected_file, temp_path)
-            
-            # تطبيق التدويرات إذا كانت موجودة
-            if self.page_rotations:
-                self.apply_rotations_to_pdf(temp_path, output_path, self.page_rotations)
-            else:
-                import shutil
-                shutil.move(temp_path, output_path)
+            # الضغط وتطبيق التدويرات في مرور واحد
+            plan = pdf_ops.EditPlan(rotations=dict(self.page_rotations), compress=True)
+            pdf_ops.apply_edit_plan(self.selected_file, plan, output_path)
 
             self.root.after(0, self.progress.stop)
             self.root.after(
@@ -3004,100 +3209,133 @@ class PDFImageProcessorPro:
             self.images_label.config(
                 text=f"✅ تم اختيار {len(self.selected_images)} صورة", fg="#22c55e"
             )
-            self.display_selected_images()
+            self.refresh_image_selection_styles()
+            self.append_image_cells()
 
-    def display_selected_images(self):
-        self.images_canvas.delete("all")
-        self.image_canvas_images.clear()
-
-        cols = 4
-        base_w = 180
-        base_h = 250
-        margin = 15
+    def image_grid(self):
+        """أبعاد شبكة الصور: (الأعمدة، العرض، الارتفاع، الهامش)"""
+        return 4, 180, 250, 15
 
-        for i, img_path in enumerate(self.selected_images):
-            try:
-                img = Image.open(img_path)
-                img.thumbnail((base_w - 20, base_h - 60), Image.Resampling.LANCZOS)
-
-                col = i % cols
-                row = i // cols
-                x = col * (base_w + margin) + margin
-                y = row * (base_h + margin) + margin
-
-                photo = ImageTk.PhotoImage(img)
-                self.image_canvas_images.append(photo)
-
-                # تحديد لون الإطار حسب التحديد
-                outline_color = "#ef4444" if i in self.selected_image_indices else "#2563eb"
-                outline_width = 4 if i in self.selected_image_indices else 2
-
-                rect_tag = f"img_rect_{i}"
-                text_tag = f"img_text_{i}"
-                img_tag = f"img_img_{i}"
-                filename_tag = f"img_filename_{i}"
-
-                self.images_canvas.create_rectangle(
-                    x,
-                    y,
-                    x + base_w,
-                    y + base_h,
-                    outline=outline_color,
-                    width=outline_width,
-                    tags=rect_tag,
-                )
-
-                self.images_canvas.create_text(
-                    x + base_w // 2,
-                    y + 15,
-                    text=f"#{i + 1}",
-                    font=("Arial", 13, "bold"),
-                    fill="#111827",
-                    tags=text_tag,
-                )
-
-                self.images_canvas.create_image(
-                    x + base_w // 2,
-                    y + base_h // 2,
-                    image=photo,
-                    anchor="center",
-                    tags=img_tag,
-                )
+    def get_image_thumbnail(self, img_path: str):
+        """(صورة مصغرة، PhotoImage) للملف، تُحسب مرة واحدة لكل path + mtime + size"""
+        try:
+            st = os.stat(img_path)
+            key = (img_path, st.st_mtime_ns, st.st_size)
+        except OSError:
+            key = (img_path, None, None)
+
+        cached = self.image_thumb_cache.get(key)
+        if cached is not None:
+            self.image_thumb_cache.move_to_end(key)
+            return cached
+
+        _, base_w, base_h, _ = self.image_grid()
+        img = image_ops.load_image(img_path, (base_w - 20, base_h - 60), mode=None)
+        cached = (img, ImageTk.PhotoImage(img))
+        self.image_thumb_cache[key] = cached
+        while len(self.image_thumb_cache) > self.image_thumb_cache_size:
+            self.image_thumb_cache.popitem(last=False)
+        return cached
+
+    def create_image_cell(self, img_path: str):
+        """إنشاء عناصر اللوحة لصورة واحدة (تُوضع في مكانها لاحقاً)"""
+        _, base_w, base_h, _ = self.image_grid()
+        try:
+            _, photo = self.get_image_thumbnail(img_path)
+        except Exception:
+            print(f"خطأ: {img_path}")
+            photo = None
+
+        canvas = self.images_canvas
+        items = [
+            canvas.create_rectangle(0, 0, base_w, base_h, tags="image_cell"),
+            canvas.create_text(
+                0, 0, font=("Arial", 13, "bold"), fill="#111827", tags="image_cell"
+            ),
+            canvas.create_image(0, 0, image=photo, anchor="center", tags="image_cell")
+            if photo is not None
+            else None,
+            canvas.create_text(
+                0,
+                0,
+                text=os.path.basename(img_path)[:22],
+                font=("Arial", 9, "bold"),
+                fill="#374151",
+                tags="image_cell",
+            ),
+        ]
+        return {"items": items, "photo": photo}
+
+    def place_image_cell(self, index: int):
+        """نقل عناصر الصورة إلى موضعها في الشبكة وتحديث رقمها وإطارها"""
+        cols, base_w, base_h, margin = self.image_grid()
+        rect, number, image_item, filename = self.image_cells[index]["items"]
+        x = (index % cols) * (base_w + margin) + margin
+        y = (index // cols) * (base_h + margin) + margin
+
+        canvas = self.images_canvas
+        canvas.coords(rect, x, y, x + base_w, y + base_h)
+        canvas.coords(number, x + base_w // 2, y + 15)
+        canvas.itemconfig(number, text=f"#{index + 1}")
+        if image_item is not None:
+            canvas.coords(image_item, x + base_w // 2, y + base_h // 2)
+        canvas.coords(filename, x + base_w // 2, y + base_h - 10)
+        self.style_image_cell(index)
+
+    def style_image_cell(self, index: int):
+        """تحديد لون الإطار حسب التحديد"""
+        selected = index in self.selected_image_indices
+        self.images_canvas.itemconfig(
+            self.image_cells[index]["items"][0],
+            outline="#ef4444" if selected else "#2563eb",
+            width=4 if selected else 2,
+        )
 
-                filename = os.path.basename(img_path)
-                self.images_canvas.create_text(
-                    x + base_w // 2,
-                    y + base_h - 10,
-                    text=filename[:22],
-                    font=("Arial", 9, "bold"),
-                    fill="#374151",
-                    tags=filename_tag,
-                )
+    def relayout_image_cells(self, start: int = 0, end: int = None):
+        """إعادة وضع الصور من start إلى end فقط (بدون إعادة تحميل الصور)"""
+        end = len(self.image_cells) if end is None else min(end, len(self.image_cells))
+        for index in range(max(0, start), end):
+            self.place_image_cell(index)
+        self.update_images_scrollregion()
+
+    def update_images_scrollregion(self):
+        cols, base_w, base_h, margin = self.image_grid()
+        rows = (len(self.image_cells) + cols - 1) // cols
+        self.images_canvas.configure(
+            scrollregion=(
+                0,
+                0,
+                cols * (base_w + margin) + margin,
+                rows * (base_h + margin) + margin,
+            )
+        )
 
-                # ربط أحداث النقر والسحب
-                for tag in (rect_tag, text_tag, img_tag, filename_tag):
-                    self.images_canvas.tag_bind(
-                        tag,
-                        "<Button-1>",
-                        lambda e, idx=i: self.start_image_drag(e, idx),
-                    )
-                    self.images_canvas.tag_bind(tag, "<B1-Motion>", self.on_image_drag)
-                    self.images_canvas.tag_bind(tag, "<ButtonRelease-1>", self.end_image_drag)
+    def append_image_cells(self):
+        """إنشاء عناصر للصور المضافة حديثاً فقط"""
+        start = len(self.image_cells)
+        for img_path in self.selected_images[start:]:
+            self.image_cells.append(self.create_image_cell(img_path))
+        self.relayout_image_cells(start)
 
-            except Exception as e:
-                print(f"خطأ: {img_path}")
+    def display_selected_images(self):
+        """إعادة بناء الشبكة بالكامل (الصور المصغرة تأتي من الذاكرة المؤقتة)"""
+        self.images_canvas.delete("image_cell")
+        self.image_cells.clear()
+        self.append_image_cells()
 
-        self.images_canvas.configure(scrollregion=self.images_canvas.bbox("all"))
+    def refresh_image_selection_styles(self):
+        for index in range(len(self.image_cells)):
+            self.style_image_cell(index)
 
     def select_all_images(self):
         """تحديد جميع الصور"""
         self.selected_image_indices = set(range(len(self.selected_images)))
-        self.display_selected_images()
+        self.refresh_image_selection_styles()
 
     def clear_image_selection(self):
         """إلغاء تحديد جميع الصور"""
         self.selected_image_indices.clear()
-        self.display_selected_images()
+        self.refresh_image_selection_styles()
 
     def clear_images(self):
         self.selected_images.clear()
@@ -3105,6 +3343,11 @@ class PDFImageProcessorPro:
         self.images_label.config(text="لم يتم اختيار صور", fg="#9ca3af")
         self.display_selected_images()
 
+    def on_image_press(self, event):
+        img_idx = self.get_image_at_position(event.x, event.y)
+        if img_idx is not None:
+            self.start_image_drag(event, img_idx)
+
     def start_image_drag(self, event, img_idx: int):
         """بدء السحب لإعادة الترتيب أو التحديد"""
         self.image_drag_data["item"] = img_idx
@@ -3123,12 +3366,14 @@ class PDFImageProcessorPro:
                 if new_idx is not None and new_idx != self.image_drag_data["item"]:
                     old_idx = self.image_drag_data["item"]
                     self.selected_images.insert(new_idx, self.selected_images.pop(old_idx))
+                    self.image_cells.insert(new_idx, self.image_cells.pop(old_idx))
                     # تحديث التحديد
                     if old_idx in self.selected_image_indices:
                         self.selected_image_indices.remove(old_idx)
                         self.selected_image_indices.add(new_idx)
                     self.image_drag_data["item"] = new_idx
-                    self.display_selected_images()
+                    # نقل العناصر المتأثرة فقط
+                    self.relayout_image_cells(min(old_idx, new_idx), max(old_idx, new_idx) + 1)
 
     def end_image_drag(self, event):
         """إنهاء السحب"""
@@ -3143,7 +3388,7 @@ class PDFImageProcessorPro:
                         self.selected_image_indices.remove(img_idx)
                     else:
                         self.selected_image_indices.add(img_idx)
-                    self.display_selected_images()
+                    self.style_image_cell(img_idx)
                     return
 
             self.image_drag_data["item"] = None
@@ -3152,13 +3397,10 @@ class PDFImageProcessorPro:
     def get_image_at_position(self, x, y):
         """الحصول على فهرس الصورة في الموضع المحدد"""
         canvas_y = self.images_canvas.canvasy(y)
-        cols = 4
-        base_w = 180
-        base_h = 250
-        margin = 15
+        cols, base_w, base_h, margin = self.image_grid()
 
-        col = int((x - margin) / (base_w + margin))
-        row = int((canvas_y - margin) / (base_h + margin))
+        col = int((self.images_canvas.canvasx(x) - margin) // (base_w + margin))
+        row = int((canvas_y - margin) // (base_h + margin))
 
         if col < 0 or col >= cols:
             return None
@@ -3189,6 +3431,10 @@ class PDFImageProcessorPro:
                     self.selected_images[idx - 1],
                     self.selected_images[idx],
                 )
+                self.image_cells[idx], self.image_cells[idx - 1] = (
+                    self.image_cells[idx - 1],
+                    self.image_cells[idx],
+                )
                 # تحديث التحديد
                 updated_indices.add(idx - 1)
                 if idx - 1 in self.selected_image_indices:
@@ -3196,8 +3442,9 @@ class PDFImageProcessorPro:
             else:
                 updated_indices.add(idx)
 
+        previous = self.selected_image_indices
         self.selected_image_indices = updated_indices
-        self.display_selected_images()
+        self.relayout_image_cells(min(previous | updated_indices), max(previous | updated_indices) + 1)
 
     def move_image_down(self):
         """نقل الصور المحددة لأسفل"""
@@ -3220,6 +3467,10 @@ class PDFImageProcessorPro:
                     self.selected_images[idx + 1],
                     self.selected_images[idx],
                 )
+                self.image_cells[idx], self.image_cells[idx + 1] = (
+                    self.image_cells[idx + 1],
+                    self.image_cells[idx],
+                )
                 # تحديث التحديد
                 updated_indices.add(idx + 1)
                 if idx + 1 in self.selected_image_indices:
@@ -3227,8 +3478,9 @@ class PDFImageProcessorPro:
             else:
                 updated_indices.add(idx)
 
+        previous = self.selected_image_indices
         self.selected_image_indices = updated_indices
-        self.display_selected_images()
+        self.relayout_image_cells(min(previous | updated_indices), max(previous | updated_indices) + 1)
 
     def remove_selected_image(self):
         """حذف الصور المحددة"""
@@ -3241,6 +3493,9 @@ class PDFImageProcessorPro:
         for idx in indices_to_remove:
             if 0 <= idx < len(self.selected_images):
                 self.selected_images.pop(idx)
+                for item in self.image_cells.pop(idx)["items"]:
+                    if item is not None:
+                        self.images_canvas.delete(item)
 
         self.selected_image_indices.clear()
         self.images_label.config(
@@ -3249,7 +3504,8 @@ class PDFImageProcessorPro:
             else "لم يتم اختيار صور",
             fg="#22c55e" if self.selected_images else "#9ca3af",
         )
-        self.display_selected_images()
+        # الصور التي قبل أول صورة محذوفة لم يتغير موضعها
+        self.relayout_image_cells(indices_to_remove[-1])
 
     def update_custom_input_state(self):
         """تفعيل/تعطيل حقل عدد الصور"""
@@ -3258,41 +3514,44 @@ class PDFImageProcessorPro:
         else:
             self.custom_count_entry.config(state="disabled")
 
+    def get_image_dpi(self):
+        """قراءة دقة الإخراج: "auto" أو رقم (None إذا كانت القيمة غير صحيحة)"""
+        dpi_str = self.image_dpi_var.get().strip().lower() or "auto"
+        if dpi_str == "auto":
+            return "auto"
+        try:
+            dpi = int(dpi_str)
+            if dpi < 72:
+                raise ValueError("DPI يجب أن يكون 72 أو أكثر")
+        except ValueError as e:
+            messagebox.showerror("خطأ", f"DPI غير صحيح: {e}")
+            return None
+        return dpi
+
     def preview_images_pdf(self):
-        """معاينة PDF قبل الحفظ"""
+        """معاينة ترتيب الصفحات قبل الحفظ (بدون إنشاء PDF)"""
         if not self.selected_images:
             messagebox.showwarning("تحذير", "اختر صوراً أولاً!")
             return
 
-        import tempfile
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-        temp_path = temp_file.name
-        temp_file.close()
-
-        threading.Thread(
-            target=self.process_preview_images_pdf, args=(temp_path,), daemon=True
-        ).start()
+        dpi = self.get_image_dpi()
+        if dpi is None:
+            return
 
-    def process_preview_images_pdf(self, temp_path: str):
-        """معالجة معاينة PDF"""
         try:
-            self.progress2.start()
-
             layout = self.image_layout_var.get()
             images_per_page = int(self.images_per_page_var.get()) if layout == "custom" else 1
-
-            total_pages = image_ops.images_to_pdf(
-                self.selected_images, temp_path, layout=layout, images_per_page=images_per_page
-            )
-
-            self.root.after(0, self.progress2.stop)
-            self.root.after(0, lambda: self.show_images_preview(temp_path, total_pages))
+            # حساب مواضع الصور فقط؛ يُبنى PDF الحقيقي عند الحفظ
+            pages = image_ops.plan_layout(self.selected_images, layout, images_per_page)
         except Exception as e:
-            self.root.after(0, self.progress2.stop)
-            self.root.after(0, lambda: messagebox.showerror("❌ خطأ", str(e)))
+            messagebox.showerror("❌ خطأ", str(e))
+            return
 
-    def show_images_preview(self, preview_pdf_path: str, total_pages: int):
+        self.show_images_preview(pages, dpi)
+
+    def show_images_preview(self, pages, dpi="auto"):
         """نافذة معاينة PDF للصور"""
+        total_pages = len(pages)
         preview_window = tk.Toplevel(self.root)
         preview_window.title("👁️ معاينة PDF")
         preview_window.geometry("1200x800")
@@ -3341,52 +3600,58 @@ class PDFImageProcessorPro:
         preview_canvas.bind("<MouseWheel>", on_mousewheel)
         preview_canvas.bind("<Enter>", lambda e: preview_canvas.focus_set())
 
-        # تحميل الصور المصغرة
-        def load_preview():
-            try:
-                thumbnails = pdf_ops.load_page_thumbnails(preview_pdf_path, scale=0.25)
-                canvas_images = []
-
-                cols = 2
-                base_w = 400
-                base_h = 550
-                margin = 20
-
-                for i, img in enumerate(thumbnails):
-                    col = i % cols
-                    row = i // cols
-
-                    x = col * (base_w + margin) + margin
-                    y = row * (base_h + margin) + margin
-
-                    img_resized = img.resize(
-                        (base_w - 40, base_h - 80), Image.Resampling.LANCZOS
-                    )
-                    photo = ImageTk.PhotoImage(img_resized)
-                    canvas_images.append(photo)
-
-                    preview_canvas.create_rectangle(
-                        x, y, x + base_w, y + base_h, fill="#ffffff", outline="#d1d5db", width=2
-                    )
-
-                    preview_canvas.create_text(
-                        x + base_w // 2,
-                        y + 20,
-                        text=f"صفحة {i + 1}",
-                        font=("Arial", 14, "bold"),
-                        fill="#111827",
-                    )
-
-                    preview_canvas.create_image(
-                        x + base_w // 2, y + base_h // 2, image=photo, anchor="center"
-                    )
+        canvas_images = []
+        preview_canvas.canvas_images = canvas_images
 
-                preview_canvas.configure(scrollregion=preview_canvas.bbox("all"))
-                preview_canvas.canvas_images = canvas_images
-            except Exception as e:
-                messagebox.showerror("خطأ", f"خطأ في تحميل المعاينة:\n{str(e)}")
+        def draw_page(i):
+            """تركيب صفحة واحدة من الصور المصغرة ثم جدولة الصفحة التالية"""
+            if i >= total_pages or not preview_canvas.winfo_exists():
+                return
 
-        threading.Thread(target=load_preview, daemon=True).start()
+            cols = 2
+            base_w = 400
+            base_h = 550
+            margin = 20
+
+            col = i % cols
+            row = i // cols
+
+            x = col * (base_w + margin) + margin
+            y = row * (base_h + margin) + margin
+
+            thumbnails = []
+            for placement in pages[i]:
+                try:
+                    thumbnails.append(self.get_image_thumbnail(placement.image_path)[0])
+                except Exception:
+                    thumbnails.append(None)
+            page_img = image_ops.compose_preview(
+                pages[i], thumbnails, max_size=(base_w - 40, base_h - 80)
+            )
+            photo = ImageTk.PhotoImage(page_img)
+            canvas_images.append(photo)
+
+            preview_canvas.create_rectangle(
+                x, y, x + base_w, y + base_h, fill="#ffffff", outline="#d1d5db", width=2
+            )
+
+            preview_canvas.create_text(
+                x + base_w // 2,
+                y + 20,
+                text=f"صفحة {i + 1}",
+                font=("Arial", 14, "bold"),
+                fill="#111827",
+            )
+
+            preview_canvas.create_image(
+                x + base_w // 2, y + base_h // 2, image=photo, anchor="center"
+            )
+
+            preview_canvas.configure(scrollregion=preview_canvas.bbox("all"))
+            # نترك الواجهة تستجيب بين الصفحات
+            self.root.after(1, draw_page, i + 1)
+
+        draw_page(0)
 
         # أزرار التحكم
         control_frame = tk.Frame(preview_window, bg="#1e293b")
@@ -3395,7 +3660,7 @@ class PDFImageProcessorPro:
         tk.Button(
             control_frame,
             text="💾 حفظ",
-            command=lambda: self.save_preview_images_pdf(preview_window, preview_pdf_path),
+            command=lambda: self.save_preview_images_pdf(preview_window, dpi),
             bg="#22c55e",
             fg="white",
             font=("Arial", 14, "bold"),
@@ -3408,7 +3673,7 @@ class PDFImageProcessorPro:
         tk.Button(
             control_frame,
             text="❌ إلغاء",
-            command=lambda: self.cancel_images_preview(preview_window, preview_pdf_path),
+            command=lambda: self.cancel_images_preview(preview_window),
             bg="#ef4444",
             fg="white",
             font=("Arial", 14, "bold"),
@@ -3418,35 +3683,20 @@ class PDFImageProcessorPro:
             bd=0,
         ).pack(side="right", padx=10)
 
-    def save_preview_images_pdf(self, preview_window, temp_path: str):
-        """حفظ PDF من المعاينة"""
+    def save_preview_images_pdf(self, preview_window, dpi="auto"):
+        """حفظ PDF من المعاينة (يُبنى الملف الآن)"""
         output_path = filedialog.asksaveasfilename(
             defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")]
         )
+        preview_window.destroy()
         if output_path:
-            try:
-                import shutil
-                shutil.copy2(temp_path, output_path)
-                messagebox.showinfo(
-                    "✅ نجح", f"تم حفظ الملف!\n📁 {os.path.basename(output_path)}"
-                )
-                preview_window.destroy()
-                os.unlink(temp_path)
-                # مسح الحقول بعد النجاح
-                self.clear_tab2_fields()
-            except Exception as e:
-                messagebox.showerror("❌ خطأ", f"خطأ في الحفظ:\n{str(e)}")
-        else:
-            preview_window.destroy()
-            os.unlink(temp_path)
+            threading.Thread(
+                target=self.process_images_to_pdf, args=(output_path, dpi), daemon=True
+            ).start()
 
-    def cancel_images_preview(self, preview_window, temp_path: str):
+    def cancel_images_preview(self, preview_window):
         """إلغاء المعاينة"""
         preview_window.destroy()
-        try:
-            os.unlink(temp_path)
-        except:
-            pass
 
     def save_images_as_pdf(self):
         """حفظ PDF مباشرة"""
@@ -3454,6 +3704,10 @@ class PDFImageProcessorPro:
             messagebox.showwarning("تحذير", "اختر صوراً أولاً!")
             return
 
+        dpi = self.get_image_dpi()
+        if dpi is None:
+            return
+
         output_path = filedialog.asksaveasfilename(
             defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")]
         )
@@ -3461,10 +3715,10 @@ class PDFImageProcessorPro:
             return
 
         threading.Thread(
-            target=self.process_images_to_pdf, args=(output_path,), daemon=True
+            target=self.process_images_to_pdf, args=(output_path, dpi), daemon=True
         ).start()
 
-    def process_images_to_pdf(self, output_path: str):
+    def process_images_to_pdf(self, output_path: str, dpi="auto"):
         try:
             self.progress2.start()
 
@@ -3472,7 +3726,11 @@ class PDFImageProcessorPro:
             images_per_page = int(self.images_per_page_var.get()) if layout == "custom" else 1
 
             total_pages = image_ops.images_to_pdf(
-                self.selected_images, output_path, layout=layout, images_per_page=images_per_page
+                self.selected_images,
+                output_path,
+                layout=layout,
+                images_per_page=images_per_page,
+                dpi=dpi,
             )
 
             self.root.after(0, self.progress2.stop)
@@ -3499,8 +3757,7 @@ class PDFImageProcessorPro:
 
     def load_pdf_for_export(self, file_path):
         try:
-            thumbnails = pdf_ops.load_page_thumbnails(file_path, scale=0.1)
-            total_pages = len(thumbnails)
+            total_pages = pdf_ops.probe(file_path)["page_count"]
 
             self.export_file_path = file_path
             self.root.after(
@@ -3525,7 +3782,13 @@ class PDFImageProcessorPro:
             messagebox.showwarning("تحذير", "اختر ملف PDF أولاً!")
             return
 
-        output_dir = filedialog.askdirectory(title="اختر مجلد الحفظ")
+        to_zip = self.export_zip_var.get()
+        if to_zip:
+            output_dir = filedialog.asksaveasfilename(
+                defaultextension=".zip", filetypes=[("ZIP files", "*.zip")]
+            )
+        else:
+            output_dir = filedialog.askdirectory(title="اختر مجلد الحفظ")
         if not output_dir:
             return
 
@@ -3539,6 +3802,29 @@ class PDFImageProcessorPro:
             messagebox.showerror("خطأ", f"DPI غير صحيح: {e}")
             return
 
+        quality_str = self.export_quality_var.get().strip() or "85"
+        try:
+            quality = int(quality_str)
+            if not 1 <= quality <= 100:
+                raise ValueError("الجودة يجب أن تكون بين 1 و 100")
+        except ValueError as e:
+            messagebox.showerror("خطأ", f"جودة JPG غير صحيحة: {e}")
+            return
+
+        colorspace = self.export_colorspace_var.get()
+        alpha = self.export_alpha_var.get()
+        if alpha and format_ext != "png":
+            messagebox.showerror("خطأ", "الخلفية الشفافة متاحة لصيغة PNG فقط")
+            return
+        if alpha and colorspace == "bilevel":
+            messagebox.showerror("خطأ", "صور الأبيض والأسود لا تدعم الخلفية الشفافة")
+            return
+        color_options = {
+            "colorspace": colorspace,
+            "alpha": alpha,
+            "dither": self.export_dither_var.get(),
+        }
+
         pages_str = self.export_pages_var.get().strip()
         pages_list = None
         if pages_str:
@@ -3565,7 +3851,10 @@ class PDFImageProcessorPro:
 
         threading.Thread(
             target=self.process_export_images,
-            args=(self.export_file_path, output_dir, format_ext, dpi, pages_list),
+            args=(
+                self.export_file_path, output_dir, format_ext, dpi, pages_list, quality, to_zip,
+                color_options,
+            ),
             daemon=True,
         ).start()
 
@@ -3576,17 +3865,29 @@ class PDFImageProcessorPro:
         format_ext: str,
         dpi: int,
         pages: Optional[list],
+        quality: int = 85,
+        to_zip: bool = False,
+        color_options: Optional[dict] = None,
     ):
+        color_options = color_options or {}
         try:
             self.progress3.start()
 
-            if pages:
+            if to_zip:
+                # output_dir هنا هو مسار ملف ZIP
+                total_pages = pdf_ops.export_pages_to_zip(
+                    pdf_path, output_dir, pages=pages or None, format_ext=format_ext,
+                    dpi=dpi, jpeg_quality=quality, **color_options,
+                )
+            elif pages:
                 total_pages = pdf_ops.export_selected_pages_to_images(
-                    pdf_path, pages, output_dir, format_ext=format_ext, dpi=dpi
+                    pdf_path, pages, output_dir, format_ext=format_ext, dpi=dpi,
+                    jpeg_quality=quality, **color_options,
                 )
             else:
                 total_pages = pdf_ops.export_pages_to_images(
-                    pdf_path, output_dir, format_ext=format_ext, dpi=dpi
+                    pdf_path, output_dir, format_ext=format_ext, dpi=dpi,
+                    jpeg_quality=quality, **color_options,
                 )
 
             self.root.after(0, self.progress3.stop)
@@ -3979,6 +4280,8 @@ class PDFImageProcessorPro:
 
 
 if __name__ == "__main__":
+    # مطلوب لعمليات الرسم المتوازية داخل ملف exe (PyInstaller)
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = PDFImageProcessorPro(root)
     root.mainloop()
@@ -10,6 +10,7 @@ hiddenimports = [
     'fitz', 
     'image_ops', 
     'pdf_ops',
+    'cache_ops',
     'html',  # مطلوب لـ PyMuPDF
     'html.parser',  # مطلوب لـ PyMuPDF
 ]
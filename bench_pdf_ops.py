@@ -0,0 +1,138 @@
+"""
+Micro-benchmarks for pdf_ops rendering paths
+"""
+import io
+import os
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+import pdf_ops
+
+
+def _sample_logo() -> bytes:
+    """A noisy JPEG that does not compress away, used as a shared page image."""
+    noise = Image.effect_noise((480, 480), 64).convert("RGB")
+    buffer = io.BytesIO()
+    noise.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def make_sample_pdf(path: str, pages: int = 50) -> None:
+    """
+    Create a synthetic PDF with text and vector graphics on every page.
+    All pages share one embedded font and one image object, like a real
+    report, so page copying has shared resources to (not) duplicate.
+    """
+    font_buffer = fitz.Font("tiro").buffer
+    logo = _sample_logo()
+    logo_xref = 0
+    doc = fitz.open()
+    try:
+        for i in range(pages):
+            page = doc.new_page()
+            # نفس الخط المضمَّن يُعاد استخدامه (PyMuPDF يتعرف عليه ولا يضمّنه مرة أخرى)
+            page.insert_font(fontname="F0", fontbuffer=font_buffer)
+            page.insert_text((72, 72), f"Page {i + 1}", fontsize=28, fontname="F0")
+            page.insert_text(
+                (72, 110), ["Lorem ipsum dolor sit amet " * 3] * 40,
+                fontsize=10, fontname="F0", lineheight=1.6,
+            )
+            page.draw_rect(fitz.Rect(300, 600, 520, 780), color=(1, 0, 0), fill=(0.2, 0.4, 0.9))
+            logo_rect = fitz.Rect(460, 20, 560, 120)
+            if logo_xref:
+                page.insert_image(logo_rect, xref=logo_xref)
+            else:
+                logo_xref = page.insert_image(logo_rect, stream=logo)
+        doc.save(path, garbage=1, deflate=True)
+    finally:
+        doc.close()
+
+
+def timed(func, *args, **kwargs) -> float:
+    """Return wall-clock seconds for one call."""
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def bench_pixmap_to_image(pdf_path: str, dpi: int = 144) -> None:
+    """Compare PNG round-trip against pdf_ops.pixmap_to_image per page."""
+    scale = dpi / 72
+    doc = fitz.open(pdf_path)
+    try:
+        pixmaps = [
+            doc.load_page(i).get_pixmap(matrix=fitz.Matrix(scale, scale))
+            for i in range(doc.page_count)
+        ]
+    finally:
+        doc.close()
+
+    def png_round_trip():
+        for pix in pixmaps:
+            Image.open(io.BytesIO(pix.tobytes("png"))).load()
+
+    def direct():
+        for pix in pixmaps:
+            pdf_ops.pixmap_to_image(pix)
+
+    count = len(pixmaps)
+    old = timed(png_round_trip) / count * 1000
+    new = timed(direct) / count * 1000
+    print(f"pixmap -> PIL @ {dpi} DPI: png round-trip {old:.2f} ms/page, "
+          f"direct {new:.2f} ms/page ({old / new:.1f}x)")
+
+
+def bench_parallel_export(pdf_path: str, dpi: int = 300) -> None:
+    """Compare serial and process-pool page export."""
+    with tempfile.TemporaryDirectory() as out_dir:
+        serial = timed(pdf_ops.export_pages_to_images, pdf_path, out_dir, "png", dpi, workers=1)
+    with tempfile.TemporaryDirectory() as out_dir:
+        parallel = timed(pdf_ops.export_pages_to_images, pdf_path, out_dir, "png", dpi)
+    print(f"export PNG @ {dpi} DPI: serial {serial:.2f} s, "
+          f"{os.cpu_count()} workers {parallel:.2f} s ({serial / parallel:.1f}x)")
+
+
+def _per_page_copy(pdf_path: str, pages: list, output_path: str) -> None:
+    """The old page-by-page insert_pdf loop, kept as a baseline."""
+    src = fitz.open(pdf_path)
+    dst = fitz.open()
+    try:
+        for page_index in pages:
+            dst.insert_pdf(src, from_page=page_index, to_page=page_index)
+        dst.save(output_path)
+    finally:
+        src.close()
+        dst.close()
+
+
+def bench_bulk_select(pages: int = 1000) -> None:
+    """Compare per-page insert_pdf against the bulk select used by pdf_ops."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = os.path.join(tmp_dir, "large.pdf")
+        out_path = os.path.join(tmp_dir, "out.pdf")
+        make_sample_pdf(pdf_path, pages)  # every page shares one embedded font and image
+
+        cases = [
+            ("extract every 2nd page", pdf_ops.extract_pages, list(range(0, pages, 2))),
+            ("reorder (reverse)", pdf_ops.reorder_pages, list(range(pages - 1, -1, -1))),
+        ]
+        for name, func, page_list in cases:
+            old = timed(_per_page_copy, pdf_path, page_list, out_path)
+            old_size = os.path.getsize(out_path)
+            new = timed(func, pdf_path, page_list, out_path)
+            new_size = os.path.getsize(out_path)
+            print(f"{name} ({pages} pages): per-page {old:.2f} s / {old_size // 1024} KB, "
+                  f"select {new:.2f} s / {new_size // 1024} KB ({old / new:.1f}x)")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sample = os.path.join(tmp_dir, "sample.pdf")
+        make_sample_pdf(sample)
+        bench_pixmap_to_image(sample, dpi=72)
+        bench_pixmap_to_image(sample, dpi=300)
+        bench_parallel_export(sample)
+    bench_bulk_select()
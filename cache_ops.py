@@ -0,0 +1,264 @@
+"""
+Caches for rendered PDF pages
+"""
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from PIL import Image
+
+APP_NAME = "PDFPageRemover"
+
+
+def user_cache_dir() -> str:
+    """Return the per-user cache directory for the application."""
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, APP_NAME, "cache")
+
+
+def new_content_hash() -> "hashlib.blake2b":
+    """Return the hash object used for file fingerprints."""
+    return hashlib.blake2b(digest_size=16)
+
+
+def hash_file(path: str) -> str:
+    """Hash the file's content (not memoized; see file_fingerprint)."""
+    digest = new_content_hash()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Most recently used files kept in the fingerprint memo
+FINGERPRINT_CACHE_SIZE = 256
+
+# path -> ((size, mtime), fingerprint)؛ مدخل واحد لكل ملف
+_fingerprints: "OrderedDict[str, Tuple[Tuple[int, int], str]]" = OrderedDict()
+_fingerprints_lock = threading.Lock()
+
+
+def file_fingerprint(path: str) -> str:
+    """
+    Return a content hash of the file.
+    The hash is memoized per path together with its size and mtime, so it is
+    only recomputed when the file changes on disk. Only the
+    FINGERPRINT_CACHE_SIZE most recently used paths are kept.
+    """
+    st = os.stat(path)
+    key = os.path.abspath(path)
+    stamp = (st.st_size, st.st_mtime_ns)
+    with _fingerprints_lock:
+        cached = _fingerprints.get(key)
+        if cached and cached[0] == stamp:
+            _fingerprints.move_to_end(key)
+            return cached[1]
+
+    fingerprint = hash_file(path)
+
+    with _fingerprints_lock:
+        # النسخة القديمة من الملف نفسه تُستبدل بدل أن تتراكم
+        _fingerprints[key] = (stamp, fingerprint)
+        _fingerprints.move_to_end(key)
+        while len(_fingerprints) > FINGERPRINT_CACHE_SIZE:
+            _fingerprints.popitem(last=False)
+    return fingerprint
+
+
+class DiskThumbnailCache:
+    """
+    On-disk JPEG thumbnails keyed by file fingerprint, page, scale and rotation.
+    Total size is capped at max_bytes; the least recently used entries are
+    evicted first (file mtime is bumped on every hit).
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = cache_dir or os.path.join(user_cache_dir(), "thumbnails")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None  # يُحسب عند أول كتابة
+
+    def _path(self, fingerprint: str, page_index: int, scale: float, rotation: int) -> str:
+        name = f"{fingerprint}_{page_index}_{scale:g}_{rotation % 360}.jpg"
+        return os.path.join(self.cache_dir, name)
+
+    def has(self, fingerprint: str, page_index: int, scale: float, rotation: int = 0) -> bool:
+        return os.path.exists(self._path(fingerprint, page_index, scale, rotation))
+
+    def get(
+        self, fingerprint: str, page_index: int, scale: float, rotation: int = 0
+    ) -> Optional[Image.Image]:
+        """Return the cached thumbnail or None."""
+        path = self._path(fingerprint, page_index, scale, rotation)
+        try:
+            with Image.open(path) as img:
+                img.load()
+            os.utime(path)  # تحديث ترتيب LRU
+            return img
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # ملف تالف: نحذفه ونعيد الرسم
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return None
+
+    def put(
+        self, fingerprint: str, page_index: int, scale: float, rotation: int, img: Image.Image
+    ) -> None:
+        """Store a thumbnail, evicting old entries if the cache grows past max_bytes."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(fingerprint, page_index, scale, rotation)
+        if img.mode not in ("L", "RGB"):
+            img = img.convert("RGB")
+
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            img.save(temp_path, "JPEG", quality=90)
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += os.path.getsize(path)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        """Yield (path, size, mtime) for each cached file."""
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.endswith(".jpg"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            yield path, st.st_size, st.st_mtime
+
+    def _evict(self) -> None:
+        # نحذف الأقدم استخداماً حتى ينزل الحجم إلى 90% من الحد
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def clear(self) -> None:
+        with self._lock:
+            for path, _, _ in list(self._entries()):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            self._total_bytes = 0
+
+
+class PageImageCache:
+    """
+    Process-wide in-memory LRU of rendered pages with a memory budget.
+    A request for a smaller scale is served by downsampling the closest
+    larger render of the same page. Returned images are shared and must
+    not be modified in place.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._images: "OrderedDict[tuple, Image.Image]" = OrderedDict()
+        self._scales: Dict[tuple, Set[float]] = {}  # (fingerprint, page, rotation) -> scales
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _image_bytes(img: Image.Image) -> int:
+        return img.width * img.height * len(img.getbands())
+
+    def _best_key(self, fingerprint: str, page_index: int, scale: float, rotation: int):
+        scales = self._scales.get((fingerprint, page_index, rotation % 360))
+        if not scales:
+            return None
+        if scale in scales:
+            return fingerprint, page_index, rotation % 360, scale
+        larger = [s for s in scales if s > scale]
+        if not larger:
+            return None
+        return fingerprint, page_index, rotation % 360, min(larger)
+
+    def has(self, fingerprint: str, page_index: int, scale: float, rotation: int = 0) -> bool:
+        with self._lock:
+            return self._best_key(fingerprint, page_index, scale, rotation) is not None
+
+    def get(
+        self, fingerprint: str, page_index: int, scale: float, rotation: int = 0
+    ) -> Optional[Image.Image]:
+        """Return the page at scale, downsampling a larger render if needed."""
+        with self._lock:
+            key = self._best_key(fingerprint, page_index, scale, rotation)
+            if key is None:
+                return None
+            self._images.move_to_end(key)
+            img = self._images[key]
+
+        cached_scale = key[3]
+        if cached_scale == scale:
+            return img
+        ratio = scale / cached_scale
+        size = (max(1, round(img.width * ratio)), max(1, round(img.height * ratio)))
+        return img.resize(size, Image.Resampling.LANCZOS)
+
+    def put(
+        self, fingerprint: str, page_index: int, scale: float, rotation: int, img: Image.Image
+    ) -> None:
+        key = (fingerprint, page_index, rotation % 360, scale)
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                return
+            self._images[key] = img
+            self._scales.setdefault(key[:3], set()).add(scale)
+            self._bytes += self._image_bytes(img)
+
+            # حذف الأقدم استخداماً حتى نعود ضمن الميزانية
+            while self._bytes > self.max_bytes and len(self._images) > 1:
+                old_key, old_img = self._images.popitem(last=False)
+                self._bytes -= self._image_bytes(old_img)
+                scales = self._scales[old_key[:3]]
+                scales.discard(old_key[3])
+                if not scales:
+                    del self._scales[old_key[:3]]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._images.clear()
+            self._scales.clear()
+            self._bytes = 0
+
+
+thumbnail_cache = DiskThumbnailCache()
+page_image_cache = PageImageCache()
@@ -1,7 +1,220 @@
-from typing import List, Tuple
+import hashlib
+import io
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple, Union
 
+import fitz  # PyMuPDF
 from PIL import Image
 
+import cache_ops
+import pdf_ops
+
+
+class PdfPageWriter:
+    """
+    Write PDF pages to disk as they are produced.
+    Pages are buffered in an open document and flushed to output_path with
+    an incremental save once flush_bytes of image data are pending, so memory
+    use stays bounded no matter how many pages are written.
+    Images added with a key are embedded once and shared by every page that
+    uses the same key.
+    """
+
+    def __init__(self, output_path: str, flush_bytes: int = 64 * 1024 * 1024):
+        self.output_path = output_path
+        self.flush_bytes = flush_bytes
+        self.page_count = 0
+        self._doc: Optional[fitz.Document] = None
+        self._pending = 0
+        self._pending_bytes = 0
+        self._on_disk = False
+        self._xrefs: Dict[Hashable, int] = {}  # مفتاح الصورة -> رقم كائنها في الملف
+
+    def _document(self) -> "fitz.Document":
+        if self._doc is None:
+            self._doc = fitz.open(self.output_path) if self._on_disk else fitz.open()
+        return self._doc
+
+    def add_image_page(
+        self, image: Image.Image, page_size: Tuple[float, float], quality: int = 100
+    ) -> None:
+        """Append a page showing image stretched over the full page_size (points)."""
+        data = encode_for_pdf(image, lossy=True, quality=quality)
+        # الصفحات المتطابقة تشترك في كائن صورة واحد
+        key = ("encoded", hashlib.blake2b(data, digest_size=16).digest())
+        self.add_page(page_size, [((0, 0, page_size[0], page_size[1]), data, key)])
+
+    def has_image(self, key: Hashable) -> bool:
+        """True if an image with this key is already embedded."""
+        return key in self._xrefs
+
+    def add_page(
+        self,
+        page_size: Tuple[float, float],
+        placements: List[Tuple[Tuple[float, float, float, float], Optional[bytes], Optional[Hashable]]],
+    ) -> None:
+        """
+        Append a page and draw each image into its rectangle (x0, y0, x1, y1 in
+        points, origin top-left). Each placement is (rect, data, key): data is
+        encoded PNG/JPEG/TIFF bytes, and may be None when key is already embedded.
+        """
+        doc = self._document()
+        page = doc.new_page(width=page_size[0], height=page_size[1])
+        for rect, data, key in placements:
+            if key is not None and key in self._xrefs:
+                # إعادة استخدام نفس كائن الصورة بدلاً من تضمينها مرة أخرى
+                page.insert_image(fitz.Rect(rect), xref=self._xrefs[key], keep_proportion=False)
+                continue
+            xref = page.insert_image(fitz.Rect(rect), stream=data, keep_proportion=False)
+            if key is not None:
+                self._xrefs[key] = xref
+            self._pending_bytes += len(data)
+        self.page_count += 1
+        self._pending += 1
+        if self._pending_bytes >= self.flush_bytes:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered pages to disk and release them."""
+        if self._doc is None or not self._pending:
+            return
+        # deflate يضغط الصور غير المضغوطة (PNG المفكوكة) عند الكتابة
+        if self._on_disk:
+            self._doc.save(
+                self.output_path,
+                incremental=True,
+                encryption=fitz.PDF_ENCRYPT_KEEP,
+                deflate=True,
+            )
+        else:
+            self._doc.save(self.output_path, deflate=True)
+            self._on_disk = True
+        self._doc.close()
+        self._doc = None
+        self._pending = 0
+        self._pending_bytes = 0
+
+    def close(self) -> None:
+        self.flush()
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+
+    def abort(self) -> None:
+        """Discard buffered pages and remove the partial output."""
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+        if self._on_disk:
+            try:
+                os.unlink(self.output_path)
+            except OSError:
+                pass
+
+    def __enter__(self) -> "PdfPageWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+# الأوضاع التي تُضمَّن كما هي؛ الشفافية تُحذف وباقي الأوضاع تتحول إلى RGB
+NATIVE_MODES = {"1": "1", "L": "L", "LA": "L", "RGB": "RGB", "RGBA": "RGB", "CMYK": "CMYK"}
+
+
+def native_mode(mode: str) -> str:
+    """Mode an image of the given mode is embedded in: 1, L, RGB or CMYK."""
+    return NATIVE_MODES.get(mode, "RGB")
+
+
+def encode_for_pdf(img: Image.Image, lossy: bool, quality: int = 95) -> bytes:
+    """
+    Encode an image (mode 1, L, RGB or CMYK) for PDF embedding.
+    Bilevel images become 1-bit PNG, which is stored as Flate on packed bits;
+    lossless CMYK uses deflated TIFF since PNG has no CMYK.
+    """
+    buffer = io.BytesIO()
+    if img.mode == "1":
+        img.save(buffer, "PNG", optimize=True)
+    elif lossy:
+        img.save(buffer, "JPEG", quality=quality)
+    elif img.mode == "CMYK":
+        img.save(buffer, "TIFF", compression="tiff_adobe_deflate")
+    else:
+        img.save(buffer, "PNG", compress_level=6)
+    return buffer.getvalue()
+
+
+def load_image(
+    img_path: str,
+    max_size: Optional[Tuple[int, int]] = None,
+    mode: Optional[str] = "RGB",
+    reducing_gap: float = 2.0,
+) -> Image.Image:
+    """
+    Open an image converted to mode (None keeps its own mode), shrunk to fit
+    max_size if given (never enlarged).
+    JPEGs are decoded with draft() at the smallest power-of-two scale that is still
+    reducing_gap times larger than max_size, and other formats are box-reduced by
+    an integer factor before the final LANCZOS resample, so big photos are never
+    fully decoded just to make a small image.
+    """
+    if mode == "1" and max_size is not None:
+        # الصور ثنائية اللون تُصغَّر بتدرج رمادي ثم تُعاد إلى 1-bit
+        img = load_image(img_path, max_size, "L", reducing_gap)
+        return img.convert("1", dither=Image.Dither.NONE)
+    img = Image.open(img_path)
+    if max_size is not None:
+        # فك ترميز JPEG مباشرة بدقة أقل (1/2، 1/4، 1/8)
+        img.draft(
+            None, (int(max_size[0] * reducing_gap), int(max_size[1] * reducing_gap))
+        )
+    if mode is not None and img.mode != mode:
+        img = img.convert(mode)
+    if max_size is not None:
+        # thumbnail يستخدم reduce() بمعامل صحيح قبل LANCZOS
+        img.thumbnail(max_size, Image.Resampling.LANCZOS, reducing_gap=reducing_gap)
+    else:
+        img.load()
+    return img
+
+
+# أقل عدد صور يستحق تشغيل عمليات متوازية
+PARALLEL_MIN_IMAGES = 4
+
+
+def map_images(
+    job,
+    items: List[Any],
+    job_args: tuple = (),
+    workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+) -> Iterator[Any]:
+    """
+    Run job(item, *job_args) for every image item and yield the results in input order.
+    Work is spread over the shared process pool (see pdf_ops.map_in_pool) with at
+    most max_pending images in flight (default: two per worker). job must be a
+    module-level function and its result picklable.
+    Small batches (or workers=1) run serially in this process.
+    """
+    busy = max(1, min(workers or os.cpu_count() or 1, len(items)))
+
+    if busy == 1 or len(items) < PARALLEL_MIN_IMAGES:
+        for item in items:
+            yield job(item, *job_args)
+        return
+
+    if max_pending is None:
+        max_pending = busy * 2
+    yield from pdf_ops.map_in_pool(
+        job, [(item, *job_args) for item in items], workers, max_pending
+    )
+
 
 def images_to_pdf(
     image_paths: List[str],
@@ -9,6 +222,9 @@ def images_to_pdf(
     layout: str = "one_per_page",
     images_per_page: int = 1,
     page_size: Tuple[int, int] = (595, 842),  # A4 default
+    mode: str = "vector",
+    workers: Optional[int] = None,
+    dpi: Union[int, str] = "auto",
 ) -> int:
     """
     Merge images into a single PDF.
@@ -19,147 +235,304 @@ def images_to_pdf(
         layout: "one_per_page" (fill page), "multiple" (auto-fit), or "custom" (user-specified count)
         images_per_page: Number of images per page (for custom layout)
         page_size: Page size in points (width, height), default A4 (595x842)
+        mode: "vector" places each image into its rectangle on the page;
+            "raster" pastes images onto one bitmap per page
+        workers: Processes used to decode and resample images (default: CPU count)
+        dpi: Target resolution. In raster mode it is the page bitmap DPI; in
+            vector mode images with more detail than this are downsampled.
+            "auto" uses each image's own resolution at its placed size
+            (raster pages take the sharpest image on the page, 72-600 DPI)
     
     Returns:
         Number of pages created
     """
-    if not image_paths:
-        raise ValueError("image_paths cannot be empty")
+    if mode not in ("vector", "raster"):
+        raise ValueError(f"Unknown mode: {mode}")
+    if dpi != "auto" and (not isinstance(dpi, (int, float)) or dpi <= 0):
+        raise ValueError(f"Invalid dpi: {dpi}")
 
-    pages = []
-    page_width, page_height = page_size
+    pages = plan_layout(image_paths, layout, images_per_page, page_size)
+    with PdfPageWriter(output_path) as writer:
+        if mode == "vector":
+            _place_image_pages(writer, pages, page_size, dpi, workers)
+        else:
+            _write_image_pages(writer, pages, page_size, dpi, workers)
+    return writer.page_count
+
+
+# أبعاد التخطيط محسوبة على أساس هذه الدقة، وهي أيضاً أعلى دقة للصفحات النقطية
+LAYOUT_DPI = 600
+MIN_AUTO_DPI = 72
+
+Rect = Tuple[float, float, float, float]
 
+
+def _layout_cells(
+    layout: str, images_per_page: int, page_size: Tuple[int, int]
+) -> List[Tuple[float, float, float, float]]:
+    """
+    Cells (x, y, width, height in points) of one page; margins are defined in LAYOUT_DPI pixels.
+    """
+    page_width, page_height = page_size
     if layout == "one_per_page":
-        # صورة واحدة بالصفحة (ملء الصفحة)
-        # استخدام DPI عالي جداً (600 DPI) للحفاظ على الجودة القصوى
-        target_dpi = 600
-        dpi_scale = target_dpi / 72
-        page_width_px = int(page_width * dpi_scale)
-        page_height_px = int(page_height * dpi_scale)
-        
-        for img_path in image_paths:
-            img = Image.open(img_path).convert("RGB")
-            # استخدام الحجم الأصلي للصورة أولاً
-            img_width, img_height = img.size
-            
-            # حساب الحجم المطلوب مع الحفاظ على النسبة
-            ratio = min(page_width_px / img_width, page_height_px / img_height)
-            
-            # إذا كانت الصورة أصغر من الصفحة، نكبرها للحفاظ على الجودة
-            if ratio > 1.0:
-                # تكبير الصورة بجودة عالية
-                new_width = int(img_width * ratio)
-                new_height = int(img_height * ratio)
-                img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            else:
-                # الصورة كبيرة - نستخدم حجمها الأصلي أو نكبرها قليلاً
-                new_width = int(img_width * ratio)
-                new_height = int(img_height * ratio)
-                img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-            # إنشاء صفحة جديدة بجودة عالية جداً
-            page_img = Image.new("RGB", (page_width_px, page_height_px), "white")
-            x_offset = (page_width_px - new_width) // 2
-            y_offset = (page_height_px - new_height) // 2
-            page_img.paste(img_resized, (x_offset, y_offset))
-            
-            # حفظ بالحجم الكبير (بدون تصغير) للحفاظ على الجودة
-            pages.append(page_img)
-
-    elif layout == "multiple":
-        # أكثر من صورة (تلقائي - 2x2)
-        # استخدام DPI عالي جداً (600 DPI)
-        target_dpi = 600
-        dpi_scale = target_dpi / 72
-        page_width_px = int(page_width * dpi_scale)
-        page_height_px = int(page_height * dpi_scale)
-        
-        cols = 2
-        rows = 2
-        img_width = int((page_width_px - 30) // cols)  # مع هامش
-        img_height = int((page_height_px - 30) // rows)
-
-        current_page = Image.new("RGB", (page_width_px, page_height_px), "white")
-        current_count = 0
-
-        for img_path in image_paths:
-            img = Image.open(img_path).convert("RGB")
-            # استخدام resize بدلاً من thumbnail للحفاظ على الجودة
-            img.thumbnail((img_width, img_height), Image.Resampling.LANCZOS)
-            thumb_width, thumb_height = img.size
-
-            col = current_count % cols
-            row = (current_count // cols) % rows
-            x = 10 + col * (img_width + 10)
-            y = 10 + row * (img_height + 10)
-
-            current_page.paste(img, (x, y))
-            current_count += 1
-
-            if current_count % (cols * rows) == 0:
-                # حفظ بالحجم الكبير
-                pages.append(current_page)
-                current_page = Image.new("RGB", (page_width_px, page_height_px), "white")
-
-        if current_count % (cols * rows) != 0:
-            pages.append(current_page)
-
-    elif layout == "custom":
-        # عدد محدد من الصور في الصفحة
-        if images_per_page < 1:
-            images_per_page = 1
-
-        # استخدام DPI عالي جداً (600 DPI)
-        target_dpi = 600
-        dpi_scale = target_dpi / 72
-        page_width_px = int(page_width * dpi_scale)
-        page_height_px = int(page_height * dpi_scale)
-
-        # حساب عدد الأعمدة والصفوف
-        import math
+        return [(0, 0, page_width, page_height)]
+
+    dpi_scale = LAYOUT_DPI / 72
+    page_width_px = int(page_width * dpi_scale)
+    page_height_px = int(page_height * dpi_scale)
+    if layout == "multiple":
+        cols, rows, margin = 2, 2, 10
+        cell_width = (page_width_px - 30) // cols
+        cell_height = (page_height_px - 30) // rows
+    else:
+        images_per_page = max(1, images_per_page)
         cols = math.ceil(math.sqrt(images_per_page))
         rows = math.ceil(images_per_page / cols)
+        margin = 20
+        cell_width = (page_width_px - margin * (cols + 1)) // cols
+        cell_height = (page_height_px - margin * (rows + 1)) // rows
 
-        img_width = int((page_width_px - 20 * (cols + 1)) // cols)
-        img_height = int((page_height_px - 20 * (rows + 1)) // rows)
+    count = images_per_page if layout == "custom" else cols * rows
+    cells = []
+    for index in range(count):
+        col = index % cols
+        row = (index // cols) % rows
+        x = margin + col * (cell_width + margin)
+        y = margin + row * (cell_height + margin)
+        cells.append(
+            (x / dpi_scale, y / dpi_scale, cell_width / dpi_scale, cell_height / dpi_scale)
+        )
+    return cells
 
-        current_page = Image.new("RGB", (page_width_px, page_height_px), "white")
-        current_count = 0
 
-        for img_path in image_paths:
-            img = Image.open(img_path).convert("RGB")
-            img.thumbnail((img_width, img_height), Image.Resampling.LANCZOS)
-            thumb_width, thumb_height = img.size
+def _image_rect(
+    layout: str, cell: Tuple[float, float, float, float], image_size: Tuple[int, int]
+) -> Tuple[float, float, float, float]:
+    """Rectangle (x0, y0, x1, y1 in points) for an image inside its cell."""
+    x, y, cell_width, cell_height = cell
+    # حجم الصورة الطبيعي بالنقاط عند دقة الصفحات النقطية
+    width = image_size[0] * 72 / LAYOUT_DPI
+    height = image_size[1] * 72 / LAYOUT_DPI
+    if layout == "one_per_page":
+        # ملء الصفحة مع الحفاظ على النسبة والتوسيط
+        ratio = min(cell_width / width, cell_height / height)
+        width, height = width * ratio, height * ratio
+        x += (cell_width - width) / 2
+        y += (cell_height - height) / 2
+    else:
+        # تصغير فقط (مثل thumbnail) مع المحاذاة لأعلى اليسار
+        ratio = min(1.0, cell_width / width, cell_height / height)
+        width, height = width * ratio, height * ratio
+    return x, y, x + width, y + height
 
-            col = current_count % cols
-            row = (current_count // cols) % rows
-            x = 20 + col * (img_width + 20)
-            y = 20 + row * (img_height + 20)
 
-            current_page.paste(img, (x, y))
-            current_count += 1
+def _can_pass_through_jpeg(img: Image.Image) -> bool:
+    """
+    True if the JPEG can be embedded unchanged as a DCTDecode stream.
+    CMYK/YCCK files (inverted by Adobe encoders) and progressive files
+    (not supported by every PDF reader) are re-encoded instead; CMYK stays CMYK.
+    """
+    return (
+        img.format == "JPEG"
+        and img.mode in ("L", "RGB")
+        and not img.info.get("progressive")
+        and not img.info.get("progression")
+    )
 
-            if current_count % images_per_page == 0:
-                # حفظ بالحجم الكبير
-                pages.append(current_page)
-                current_page = Image.new("RGB", (page_width_px, page_height_px), "white")
 
-        if current_count % images_per_page != 0:
-            pages.append(current_page)
+@dataclass
+class ImagePlacement:
+    """Where one image goes on a page."""
+    image_path: str
+    size: Tuple[int, int]  # أبعاد الصورة الأصلية بالبكسل
+    rect: Rect  # x0, y0, x1, y1 بالنقاط من أعلى يسار الصفحة
+    mode: str  # الوضع الذي تُضمَّن به: 1 أو L أو RGB أو CMYK
 
-    else:
+
+def plan_layout(
+    image_paths: List[str],
+    layout: str = "one_per_page",
+    images_per_page: int = 1,
+    page_size: Tuple[int, int] = (595, 842),
+) -> List[List[ImagePlacement]]:
+    """
+    Compute the pages images_to_pdf would produce, as data.
+    Only image headers are read, so this is cheap enough for live previews.
+    """
+    if not image_paths:
+        raise ValueError("image_paths cannot be empty")
+    if layout not in ("one_per_page", "multiple", "custom"):
         raise ValueError(f"Unknown layout: {layout}")
 
-    if pages:
-        # حفظ بجودة عالية جداً (600 DPI)
-        # استخدام optimize=False وcompress_level=0 للحفاظ على الجودة القصوى
-        dpi = 600
-        pages[0].save(
-            output_path,
-            save_all=True,
-            append_images=pages[1:],
-            resolution=dpi,
-            quality=100,  # أقصى جودة
-            optimize=False,  # عدم الضغط للحفاظ على الجودة
+    cells = _layout_cells(layout, images_per_page, page_size)
+    pages = []
+    for start in range(0, len(image_paths), len(cells)):
+        page = []
+        for img_path, cell in zip(image_paths[start:start + len(cells)], cells):
+            with Image.open(img_path) as img:
+                size, mode = img.size, native_mode(img.mode)
+            page.append(ImagePlacement(img_path, size, _image_rect(layout, cell, size), mode))
+        pages.append(page)
+    return pages
+
+
+def compose_preview(
+    page: List[ImagePlacement],
+    images: List[Image.Image],
+    page_size: Tuple[int, int] = (595, 842),
+    max_size: Tuple[int, int] = (360, 470),
+) -> Image.Image:
+    """
+    Draw a small RGB preview of one planned page from already loaded
+    (typically thumbnail-sized) images, one per placement.
+    """
+    scale = min(max_size[0] / page_size[0], max_size[1] / page_size[1])
+    preview = Image.new("RGB", _pixel_size((0, 0) + tuple(page_size), scale * 72), "white")
+    for placement, img in zip(page, images):
+        if img is None:
+            continue
+        size = _pixel_size(placement.rect, scale * 72)
+        x0, y0 = placement.rect[:2]
+        preview.paste(
+            img.convert("RGB").resize(size, Image.Resampling.BILINEAR),
+            (round(x0 * scale), round(y0 * scale)),
         )
-    return len(pages)
+    return preview
+
+
+def _native_dpi(size: Tuple[int, int], rect: Rect) -> float:
+    """Resolution an image has when drawn into rect."""
+    return size[0] * 72 / max(rect[2] - rect[0], 1e-6)
+
+
+def _pixel_size(rect: Rect, dpi: float) -> Tuple[int, int]:
+    scale = dpi / 72
+    return (
+        max(1, round((rect[2] - rect[0]) * scale)),
+        max(1, round((rect[3] - rect[1]) * scale)),
+    )
+
+
+def _encode_image(item: Tuple[str, Optional[Tuple[int, int]]]) -> bytes:
+    """
+    Encode (path, max_size) for embedding in a PDF in the image's native mode.
+    Without max_size the image keeps its resolution and JPEGs are passed
+    through when possible.
+    """
+    img_path, max_size = item
+    with Image.open(img_path) as img:
+        if max_size is None and _can_pass_through_jpeg(img):
+            # نضمّن ملف JPEG الأصلي كما هو دون فك ترميزه
+            with open(img_path, "rb") as f:
+                return f.read()
+        source_format = img.format
+        mode = native_mode(img.mode)
+
+    img = load_image(img_path, max_size, mode)
+    # صيغ بدون فقد (PNG/BMP/GIF/TIFF) تبقى بدون فقد
+    return encode_for_pdf(img, lossy=source_format == "JPEG")
+
+
+def _place_image_pages(
+    writer: PdfPageWriter,
+    pages: List[List[ImagePlacement]],
+    page_size: Tuple[int, int],
+    dpi: Union[int, str],
+    workers: Optional[int] = None,
+) -> None:
+    """Build pages by placing each image into its rect, without page-sized bitmaps."""
+    page_keys = []
+    unique_items = {}
+    for page in pages:
+        keys = []
+        for placement in page:
+            max_size = None
+            if dpi != "auto" and _native_dpi(placement.size, placement.rect) > dpi:
+                # الصورة أدق من المطلوب: نصغّرها إلى الدقة المستهدفة
+                max_size = _pixel_size(placement.rect, dpi)
+            # الصور المتطابقة في المحتوى تُرمَّز وتُضمَّن مرة واحدة فقط
+            key = (cache_ops.file_fingerprint(placement.image_path), max_size)
+            unique_items.setdefault(key, (placement.image_path, max_size))
+            keys.append(key)
+        page_keys.append(keys)
+
+    encoded = map_images(_encode_image, list(unique_items.values()), workers=workers)
+    for page, keys in zip(pages, page_keys):
+        placements = []
+        for placement, key in zip(page, keys):
+            first_use = not writer.has_image(key) and all(key != k for _, _, k in placements)
+            placements.append((placement.rect, next(encoded) if first_use else None, key))
+        writer.add_page(page_size, placements)
+
+
+def _page_mode(modes: set) -> str:
+    """Smallest mode that holds every image on a page without loss of colour."""
+    if modes <= {"1"}:
+        return "1"
+    if modes <= {"1", "L"}:
+        return "L"
+    if modes == {"CMYK"}:
+        return "CMYK"
+    return "RGB"
+
+
+def _fit_image_job(item: Tuple[str, Tuple[int, int], str]) -> Image.Image:
+    """Load an image in mode, resized to exactly (width, height)."""
+    img_path, size, mode = item
+    img = load_image(img_path, size, mode)
+    if img.size == size:
+        return img
+    return img.resize(size, Image.Resampling.LANCZOS)
+
+
+def _write_image_pages(
+    writer: PdfPageWriter,
+    pages: List[List[ImagePlacement]],
+    page_size: Tuple[int, int],
+    dpi: Union[int, str],
+    workers: Optional[int] = None,
+) -> None:
+    """Compose each page as a bitmap and hand it to writer as soon as it is ready."""
+    page_dpis = []
+    page_modes = []
+    items = []
+    for page in pages:
+        if dpi == "auto":
+            # دقة الصفحة = دقة أوضح صورة فيها، بدون تجاوز LAYOUT_DPI
+            sharpest = max(_native_dpi(p.size, p.rect) for p in page)
+            page_dpi = min(LAYOUT_DPI, max(MIN_AUTO_DPI, sharpest))
+        else:
+            page_dpi = dpi
+        page_mode = _page_mode({p.mode for p in page})
+        # الصفحات ثنائية اللون تُركَّب بتدرج رمادي ثم تتحول إلى 1-bit
+        compose_mode = "L" if page_mode == "1" else page_mode
+        page_dpis.append(page_dpi)
+        page_modes.append(page_mode)
+        items.extend((p.image_path, _pixel_size(p.rect, page_dpi), compose_mode) for p in page)
+
+    # الصور المتطابقة بنفس الحجم تُفك وتُصغَّر مرة واحدة، وتبقى في الذاكرة حتى آخر استخدام
+    keys = [(cache_ops.file_fingerprint(path), size, mode) for path, size, mode in items]
+    last_use = {key: index for index, key in enumerate(keys)}
+    unique_items = list({key: item for key, item in zip(keys, items)}.values())
+    kept: Dict[tuple, Image.Image] = {}
+
+    # فك الترميز وتغيير الحجم يتمان في عمليات متوازية، والترتيب محفوظ
+    resized = map_images(_fit_image_job, unique_items, workers=workers)
+    index = 0
+    for page, page_dpi, page_mode in zip(pages, page_dpis, page_modes):
+        scale = page_dpi / 72
+        compose_mode = "L" if page_mode == "1" else page_mode
+        white = (0, 0, 0, 0) if compose_mode == "CMYK" else "white"
+        page_img = Image.new(compose_mode, _pixel_size((0, 0) + tuple(page_size), page_dpi), white)
+        for placement in page:
+            key = keys[index]
+            img = kept.pop(key) if key in kept else next(resized)
+            if last_use[key] > index:
+                kept[key] = img
+            index += 1
+            x0, y0 = placement.rect[:2]
+            page_img.paste(img, (round(x0 * scale), round(y0 * scale)))
+        if page_mode == "1":
+            page_img = page_img.convert("1", dither=Image.Dither.NONE)
+        # كتابة الصفحة فوراً بدلاً من الاحتفاظ بها في الذاكرة
+        writer.add_image_page(page_img, page_size)
@@ -1,27 +1,380 @@
+import atexit
 import io
+import json
+import math
+import multiprocessing
 import os
-from typing import List, Dict, Any
+import struct
+import threading
+import zipfile
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import BinaryIO, List, Dict, Any, Iterator, Optional, Set, Tuple
 
 import fitz  # PyMuPDF
 from PIL import Image
 
+import cache_ops
 
-def load_page_thumbnails(pdf_path: str, scale: float = 0.25) -> List[Image.Image]:
-    """Return PIL thumbnails for each page in the PDF."""
+
+def pixmap_to_image(pix: "fitz.Pixmap") -> Image.Image:
+    """
+    Build a PIL image straight from the pixmap samples (no PNG round-trip).
+    Handles grayscale, RGB and CMYK pixmaps, with or without alpha.
+    """
+    if pix.colorspace is None:
+        # alpha-only pixmap
+        return Image.frombytes("L", (pix.width, pix.height), pix.samples_mv, "raw", "L", pix.stride)
+
+    if pix.colorspace.n not in (1, 3, 4):
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    if pix.colorspace.n == 4 and pix.alpha:
+        # Pillow has no CMYK+alpha mode
+        pix = fitz.Pixmap(pix, 0)
+
+    # samples_mv is read through the buffer protocol: one copy, no encode/decode
+    return _samples_to_image(
+        pix.samples_mv, (pix.width, pix.height), pix.colorspace.n, bool(pix.alpha), pix.stride
+    )
+
+
+# (components, alpha) -> (PIL mode, raw mode); MuPDF stores alpha premultiplied
+_SAMPLE_MODES = {
+    (1, False): ("L", "L"),
+    (1, True): ("La", "La"),
+    (3, False): ("RGB", "RGB"),
+    (3, True): ("RGBA", "RGBa"),
+    (4, False): ("CMYK", "CMYK"),
+}
+
+
+def _samples_to_image(
+    samples, size: Tuple[int, int], n: int, alpha: bool, stride: int = 0
+) -> Image.Image:
+    """Build a PIL image from raw pixmap samples with n colour components."""
+    mode, rawmode = _SAMPLE_MODES[(n, alpha)]
+    image = Image.frombytes(mode, size, samples, "raw", rawmode, stride)
+    # Pillow has no raw mode that un-premultiplies gray+alpha on load
+    return image.convert("LA") if mode == "La" else image
+
+
+# Most recently probed files kept in memory
+PROBE_CACHE_SIZE = 64
+
+# path -> ((size, mtime), info)؛ مدخل واحد لكل ملف
+_probe_cache: "OrderedDict[str, Tuple[Tuple[int, int], Dict[str, Any]]]" = OrderedDict()
+_probe_cache_lock = threading.Lock()
+
+
+def probe(pdf_path: str) -> Dict[str, Any]:
+    """
+    Read document facts without rendering anything. Returns a dict with:
+    page_count, page_sizes [(width, height) in points, after rotation],
+    rotations [degrees per page], is_encrypted, needs_pass and metadata.
+    Results are cached per path, size and mtime (the file is not read to
+    hash it); treat them as read-only.
+    Page sizes and rotations are empty when the file needs a password.
+    """
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(f"PDF not found: {pdf_path}")
 
-    thumbnails: List[Image.Image] = []
+    st = os.stat(pdf_path)
+    key = os.path.abspath(pdf_path)
+    stamp = (st.st_size, st.st_mtime_ns)
+    with _probe_cache_lock:
+        cached = _probe_cache.get(key)
+        if cached and cached[0] == stamp:
+            _probe_cache.move_to_end(key)
+            return cached[1]
+
     doc = fitz.open(pdf_path)
     try:
-        for page_index in range(doc.page_count):
-            page = doc.load_page(page_index)
-            pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale))
-            img = Image.open(io.BytesIO(pix.tobytes("png")))
-            thumbnails.append(img)
+        needs_pass = bool(doc.needs_pass)
+        page_sizes = []
+        rotations = []
+        if not needs_pass:
+            for page in doc:
+                page_sizes.append((page.rect.width, page.rect.height))
+                rotations.append(page.rotation)
+        info = {
+            "page_count": doc.page_count,
+            "page_sizes": page_sizes,
+            "rotations": rotations,
+            "is_encrypted": bool(doc.is_encrypted),
+            "needs_pass": needs_pass,
+            "metadata": dict(doc.metadata or {}),
+        }
     finally:
         doc.close()
-    return thumbnails
+
+    with _probe_cache_lock:
+        _probe_cache[key] = (stamp, info)
+        _probe_cache.move_to_end(key)
+        while len(_probe_cache) > PROBE_CACHE_SIZE:
+            _probe_cache.popitem(last=False)
+    return info
+
+
+# Documents with fewer pages than this are rendered in-process
+PARALLEL_MIN_PAGES = 8
+# Batches with fewer rendered pixels than this in total are rendered in-process:
+# handing them to worker processes costs more than the rendering itself
+PARALLEL_MIN_PIXELS = 32 * 1024 * 1024
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def get_process_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Return the shared process pool, starting it on first use.
+    The pool has at least workers processes (default: CPU count); it is only
+    replaced when a caller asks for more. Processes start on demand, so an
+    idle pool never holds more workers than the busiest batch needed.
+    Workers are started with spawn: forking a process that runs Tk threads is unsafe.
+    """
+    global _pool, _pool_workers
+    workers = max(1, workers or os.cpu_count() or 1)
+    with _pool_lock:
+        if _pool is None or workers > _pool_workers:
+            if _pool is not None:
+                # الدفعات الجارية على المجمع القديم تكتمل ثم تنتهي عملياته
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def discard_process_pool(pool: ProcessPoolExecutor) -> None:
+    """Forget a broken shared pool so that the next call starts a fresh one."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+            _pool_workers = 0
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def shutdown_process_pool() -> None:
+    """Stop the shared pool's worker processes (also run at interpreter exit)."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        pool, _pool, _pool_workers = _pool, None, 0
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def map_in_pool(
+    fn,
+    calls: List[tuple],
+    workers: Optional[int],
+    max_pending: int,
+    run_first_here: bool = False,
+) -> Iterator[Any]:
+    """
+    Run fn(*args) for every args tuple in calls on the shared process pool and
+    yield the results in order. At most max_pending calls are in flight and a
+    new one is submitted for each result consumed, so results never pile up
+    ahead of the consumer. run_first_here runs the first call in this process
+    while the workers start. fn must be a module-level function and its result
+    picklable.
+    """
+    pool = get_process_pool(workers)
+    pending = deque()
+    remaining = iter(calls[1:] if run_first_here else calls)
+    try:
+        for args in remaining:
+            pending.append(pool.submit(fn, *args))
+            if len(pending) >= max_pending:
+                break
+        if run_first_here and calls:
+            yield fn(*calls[0])
+        while pending:
+            result = pending.popleft().result()
+            # نرسل مهمة جديدة مقابل كل نتيجة تُستهلك
+            for args in remaining:
+                pending.append(pool.submit(fn, *args))
+                break
+            yield result
+    except BrokenProcessPool:
+        discard_process_pool(pool)
+        raise
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _render_pixels(pdf_path: str, pages: List[int], scale: float) -> Optional[float]:
+    """Estimated number of pixels rendered for pages at scale (None if unknown)."""
+    page_sizes = probe(pdf_path)["page_sizes"]
+    if not page_sizes:
+        return None
+    return sum(page_sizes[p][0] * page_sizes[p][1] for p in pages) * scale * scale
+
+
+def _run_page_chunk(pdf_path: str, page_indices: List[int], job, job_args: tuple) -> list:
+    """Open the document once and run job(doc, page_index, *job_args) per page."""
+    doc = fitz.open(pdf_path)
+    try:
+        return [job(doc, page_index, *job_args) for page_index in page_indices]
+    finally:
+        doc.close()
+
+
+def render_pages(
+    pdf_path: str,
+    pages: List[int],
+    job,
+    job_args: tuple = (),
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    scale: Optional[float] = None,
+) -> Iterator[Any]:
+    """
+    Run job(doc, page_index, *job_args) for every page and yield the results in page order.
+    Pages are split into contiguous chunks across the shared process pool; each worker
+    opens its own copy of the document. At most two chunks per worker are in flight,
+    so results never pile up ahead of the consumer. job must be a module-level
+    function and its result picklable.
+    scale: render scale of the job, used to estimate its cost. Small documents, cheap
+    batches (such as low-scale thumbnails) and workers=1 run serially in this process.
+    """
+    # عدد الدفعات المتزامنة لا يتجاوز عدد الصفحات؛ حجم المجمع المشترك لا يتأثر به
+    busy = max(1, min(workers or os.cpu_count() or 1, len(pages)))
+
+    serial = busy == 1 or len(pages) < PARALLEL_MIN_PAGES
+    if not serial and scale is not None:
+        pixels = _render_pixels(pdf_path, pages, scale)
+        serial = pixels is not None and pixels < PARALLEL_MIN_PIXELS
+    if serial:
+        doc = fitz.open(pdf_path)
+        try:
+            for page_index in pages:
+                yield job(doc, page_index, *job_args)
+        finally:
+            doc.close()
+        return
+
+    if chunk_size is None:
+        # عدة دفعات لكل عامل لتوزيع الحمل وإظهار أولى النتائج بسرعة
+        chunk_size = max(1, min(32, math.ceil(len(pages) / (busy * 4))))
+    chunks = [pages[i:i + chunk_size] for i in range(0, len(pages), chunk_size)]
+
+    # الدفعة الأولى تُرسم هنا بينما تبدأ العمليات الأخرى بالعمل
+    results = map_in_pool(
+        _run_page_chunk,
+        [(pdf_path, chunk, job, job_args) for chunk in chunks],
+        workers,
+        max_pending=busy * 2,
+        run_first_here=True,
+    )
+    try:
+        for chunk_results in results:
+            yield from chunk_results
+    finally:
+        results.close()
+
+
+def _thumbnail_job(
+    doc, page_index: int, scale: float, rotation: int = 0
+) -> Tuple[int, Image.Image]:
+    page = doc.load_page(page_index)
+    if rotation:
+        # تدوير إضافي فوق تدوير الصفحة في الملف (في الذاكرة فقط)
+        page.set_rotation((page.rotation + rotation) % 360)
+    pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale))
+    return page_index, pixmap_to_image(pix)
+
+
+def _rotated_thumbnail_job(
+    doc, page_index: int, scale: float, rotations: Dict[int, int]
+) -> Tuple[int, Image.Image]:
+    return _thumbnail_job(doc, page_index, scale, rotations.get(page_index, 0))
+
+
+def iter_page_thumbnails(
+    pdf_path: str,
+    scale: float = 0.25,
+    workers: Optional[int] = None,
+    pages: Optional[List[int]] = None,
+    rotations: Optional[Dict[int, int]] = None,
+    use_cache: bool = True,
+) -> Iterator[Tuple[int, Image.Image]]:
+    """
+    Yield (page_index, thumbnail) for each page, in order, as soon as it is rendered.
+    pages: 0-based pages to render (default: all pages).
+    rotations: extra rotation per page {page_index: angle}, on top of the page's own.
+    Thumbnails are served from the shared in-memory cache, then the on-disk
+    cache, and only rendered when neither has them. Returned images are
+    shared: copy before modifying them in place.
+    """
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(f"PDF not found: {pdf_path}")
+
+    if pages is None:
+        pages = list(range(probe(pdf_path)["page_count"]))
+    rotations = rotations or {}
+
+    if not use_cache:
+        yield from render_pages(
+            pdf_path, pages, _rotated_thumbnail_job, (scale, rotations), workers=workers,
+            scale=scale,
+        )
+        return
+
+    memory = cache_ops.page_image_cache
+    cache = cache_ops.thumbnail_cache
+    fingerprint = cache_ops.file_fingerprint(pdf_path)
+    missing = [
+        p for p in pages
+        if not memory.has(fingerprint, p, scale, rotations.get(p, 0))
+        and not cache.has(fingerprint, p, scale, rotations.get(p, 0))
+    ]
+    rendered = render_pages(
+        pdf_path, missing, _rotated_thumbnail_job, (scale, rotations), workers=workers,
+        scale=scale,
+    )
+    missing_set = set(missing)
+
+    fallback_doc = None
+    try:
+        for page_index in pages:
+            rotation = rotations.get(page_index, 0)
+            if page_index in missing_set:
+                _, img = next(rendered)
+                cache.put(fingerprint, page_index, scale, rotation, img)
+            else:
+                img = memory.get(fingerprint, page_index, scale, rotation)
+                if img is not None:
+                    yield page_index, img
+                    continue
+                img = cache.get(fingerprint, page_index, scale, rotation)
+                if img is None:
+                    # حُذف من الذاكرة المؤقتة بعد الفحص
+                    if fallback_doc is None:
+                        fallback_doc = fitz.open(pdf_path)
+                    _, img = _thumbnail_job(fallback_doc, page_index, scale, rotation)
+                    cache.put(fingerprint, page_index, scale, rotation, img)
+            memory.put(fingerprint, page_index, scale, rotation, img)
+            yield page_index, img
+    finally:
+        rendered.close()
+        if fallback_doc is not None:
+            fallback_doc.close()
+
+
+def load_page_thumbnails(
+    pdf_path: str, scale: float = 0.25, workers: Optional[int] = None
+) -> List[Image.Image]:
+    """Return PIL thumbnails for each page in the PDF."""
+    return [img for _, img in iter_page_thumbnails(pdf_path, scale, workers)]
 
 
 def delete_pages(pdf_path: str, pages_to_delete: List[int], output_path: str) -> int:
@@ -57,17 +410,15 @@ def extract_pages(pdf_path: str, pages_to_keep: List[int], output_path: str) ->
     if not pages_to_keep:
         raise ValueError("pages_to_keep cannot be empty")
 
-    src = fitz.open(pdf_path)
-    dst = fitz.open()
+    unique_pages = sorted(set(pages_to_keep))
+    doc = fitz.open(pdf_path)
     try:
-        unique_pages = sorted(set(pages_to_keep))
-        for page_index in unique_pages:
-            if 0 <= page_index < src.page_count:
-                dst.insert_pdf(src, from_page=page_index, to_page=page_index)
-        dst.save(output_path)
+        doc.select([p for p in unique_pages if 0 <= p < doc.page_count])
+        save_path = _save_target(pdf_path, output_path)
+        doc.save(save_path, garbage=2)
     finally:
-        src.close()
-        dst.close()
+        doc.close()
+    _commit_save(save_path, output_path)
     return len(unique_pages)
 
 
@@ -95,37 +446,533 @@ def rotate_pages(
     return rotated_count
 
 
-def export_pages_to_images(
-    pdf_path: str, output_dir: str, format_ext: str = "png", dpi: int = 144
-) -> int:
+def _page_runs(pages: List[int]) -> List[Tuple[int, int]]:
+    """Coalesce page indices into (first, last) runs of consecutive pages."""
+    runs: List[Tuple[int, int]] = []
+    for page in pages:
+        if runs and page == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], page)
+        else:
+            runs.append((page, page))
+    return runs
+
+
+def _save_target(pdf_path: str, output_path: str) -> str:
     """
-    Export all pages as images to output_dir. Returns number of pages exported.
-    format_ext: 'png' or 'jpg'. dpi controls rasterization quality.
+    Path to save to when writing output_path from pdf_path.
+    A document cannot be saved over the file it was opened from, so in that
+    case a temporary file next to it is used; see _commit_save.
     """
-    if format_ext not in ("png", "jpg", "jpeg"):
-        raise ValueError("format_ext must be png or jpg")
+    if os.path.exists(output_path) and os.path.samefile(pdf_path, output_path):
+        return f"{output_path}.tmp"
+    return output_path
+
+
+def _commit_save(save_path: str, output_path: str) -> None:
+    """Move a temporary save into place (after the source is closed)."""
+    if save_path != output_path:
+        os.replace(save_path, output_path)
 
-    os.makedirs(output_dir, exist_ok=True)
 
-    scale = dpi / 72
+@dataclass
+class EditPlan:
+    """
+    Edits to apply to a PDF in one pass.
+    page_order lists original 0-based pages in output order (None keeps the
+    original order); pages in deleted are dropped; rotations maps original
+    page index to an extra clockwise angle added to the page's own rotation.
+    """
+    page_order: Optional[List[int]] = None
+    deleted: Set[int] = field(default_factory=set)
+    rotations: Dict[int, int] = field(default_factory=dict)
+    compress: bool = False
+
+    def output_pages(self, page_count: int) -> List[int]:
+        """Original page indices that end up in the output, in order."""
+        order = range(page_count) if self.page_order is None else self.page_order
+        return [p for p in order if 0 <= p < page_count and p not in self.deleted]
+
+
+def apply_edit_plan(pdf_path: str, plan: EditPlan, output_path: str) -> int:
+    """
+    Apply an EditPlan with a single open/select/save.
+    Returns number of pages in the output PDF.
+    """
     doc = fitz.open(pdf_path)
-    total_pages = doc.page_count
     try:
-        for page_index in range(total_pages):
-            page = doc.load_page(page_index)
-            pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale))
-            file_name = f"page_{page_index + 1:03d}.{format_ext}"
-            img_path = os.path.join(output_dir, file_name)
-
-            if format_ext.lower() == "png":
-                pix.save(img_path)
-            else:
-                image = Image.open(io.BytesIO(pix.tobytes("png")))
-                image.save(img_path, "JPEG", quality=85)
+        pages = plan.output_pages(doc.page_count)
+        if not pages:
+            raise ValueError("edit plan leaves no pages")
+
+        if pages != list(range(doc.page_count)):
+            doc.select(pages)
+
+        if plan.rotations:
+            for new_index, original_index in enumerate(pages):
+                angle = plan.rotations.get(original_index, 0) % 360
+                if angle:
+                    page = doc.load_page(new_index)
+                    page.set_rotation((page.rotation + angle) % 360)
+
+        save_path = _save_target(pdf_path, output_path)
+        if plan.compress:
+            doc.save(save_path, deflate=True, garbage=4)
+        else:
+            # garbage=2 يحذف كائنات الصفحات المحذوفة ويضغط جدول xref
+            doc.save(save_path, garbage=2)
     finally:
         doc.close()
+    _commit_save(save_path, output_path)
+    return len(pages)
+
+
+EXPORT_COLORSPACES = ("rgb", "gray", "bilevel")
+
+
+@dataclass(frozen=True)
+class _ExportFormat:
+    """How exported pages are rendered and encoded."""
+
+    format_ext: str
+    dpi: int
+    jpeg_quality: int = 85
+    colorspace: str = "rgb"  # rgb, gray or bilevel (1-bit)
+    alpha: bool = False  # transparent background (PNG only)
+    threshold: int = 128  # bilevel: gray levels below this become black
+    dither: bool = False  # bilevel: Floyd-Steinberg instead of a fixed threshold
+
+    @property
+    def scale(self) -> float:
+        return self.dpi / 72
+
+    @property
+    def is_png(self) -> bool:
+        return self.format_ext.lower() == "png"
+
+    @property
+    def fitz_colorspace(self) -> "fitz.Colorspace":
+        return fitz.csRGB if self.colorspace == "rgb" else fitz.csGRAY
+
+    def settings(self) -> Dict[str, Any]:
+        """The fields that change the output of this format, for the export manifest."""
+        settings: Dict[str, Any] = {
+            "format_ext": self.format_ext,  # يحدد أسماء الملفات أيضاً
+            "dpi": self.dpi,
+            "colorspace": self.colorspace,
+        }
+        if not self.is_png:
+            settings["jpeg_quality"] = self.jpeg_quality
+        if self.colorspace == "bilevel":
+            settings["dither"] = self.dither
+            if not self.dither:
+                settings["threshold"] = self.threshold
+        elif self.is_png:
+            settings["alpha"] = self.alpha
+        return settings
+
+
+def _export_format(
+    format_ext: str,
+    dpi: int,
+    jpeg_quality: int,
+    colorspace: str,
+    alpha: bool,
+    threshold: int,
+    dither: bool,
+) -> _ExportFormat:
+    if format_ext not in ("png", "jpg", "jpeg"):
+        raise ValueError("format_ext must be png or jpg")
+    if not 1 <= jpeg_quality <= 100:
+        raise ValueError("jpeg_quality must be between 1 and 100")
+    if colorspace not in EXPORT_COLORSPACES:
+        raise ValueError(f"colorspace must be one of {', '.join(EXPORT_COLORSPACES)}")
+    if not 0 <= threshold <= 255:
+        raise ValueError("threshold must be between 0 and 255")
+    if alpha and format_ext != "png":
+        raise ValueError("alpha needs png output")
+    if alpha and colorspace == "bilevel":
+        raise ValueError("bilevel output cannot have alpha")
+    return _ExportFormat(format_ext, dpi, jpeg_quality, colorspace, alpha, threshold, dither)
+
+
+def _to_bilevel(image: Image.Image, fmt: _ExportFormat) -> Image.Image:
+    """Turn a grayscale page into a 1-bit image."""
+    if fmt.dither:
+        return image.convert("1")  # Floyd-Steinberg
+    return image.point(lambda v: 255 if v >= fmt.threshold else 0).convert(
+        "1", dither=Image.Dither.NONE
+    )
+
+
+# Pages with more pixels than this are rendered in horizontal bands on export
+BANDED_EXPORT_MIN_PIXELS = 64 * 1024 * 1024
+# Approximate size of one rendered band (RGB bytes)
+EXPORT_BAND_BYTES = 32 * 1024 * 1024
+# Extra rows rendered above and below each band so that anti-aliasing at
+# the band edges matches a full-page render
+_BAND_OVERLAP = 32
+
+
+def _iter_page_bands(
+    page: "fitz.Page",
+    matrix: "fitz.Matrix",
+    colorspace: "fitz.Colorspace" = fitz.csRGB,
+    alpha: bool = False,
+    band_bytes: Optional[int] = None,
+) -> Iterator[Tuple[int, int, memoryview]]:
+    """
+    Render page in horizontal bands and yield (top, rows, samples) per band.
+    samples holds rows * width * n bytes (n = colour components + alpha) and
+    is only valid until the next band. band_bytes defaults to EXPORT_BAND_BYTES.
+    """
+    display_list = page.get_displaylist()  # محتوى الصفحة يُحلَّل مرة واحدة لكل الشرائط
+    irect = (page.rect * matrix).irect
+    width, height = irect.width, irect.height
+    n = colorspace.n + alpha
+    band_rows = max(1, (band_bytes or EXPORT_BAND_BYTES) // (width * n))
+    zoom_y = matrix.d
+    rect = page.rect
+
+    for top in range(0, height, band_rows):
+        bottom = min(height, top + band_rows)
+        first = max(0, top - _BAND_OVERLAP)
+        last = min(height, bottom + _BAND_OVERLAP)
+        # حدود الشريط من حواف الصفوف بالبكسل مباشرة
+        clip = fitz.Rect(
+            rect.x0, (irect.y0 + first) / zoom_y, rect.x1, (irect.y0 + last) / zoom_y
+        )
+        pix = display_list.get_pixmap(matrix=matrix, colorspace=colorspace, clip=clip, alpha=alpha)
+        # MuPDF يقرّب حدود القص، فقد يزيد الشريط أو ينقص سطراً أو عموداً
+        offset_x, offset_y = pix.x - irect.x0, pix.y - irect.y0
+        if (offset_x == 0 and pix.width == width
+                and offset_y <= top and offset_y + pix.height >= bottom):
+            start = (top - offset_y) * pix.stride
+            yield top, bottom - top, pix.samples_mv[start:start + (bottom - top) * pix.stride]
+        else:
+            yield top, bottom - top, _fit_band(pix, offset_x, offset_y, top, bottom, width, n, alpha)
+
+
+def _fit_band(
+    pix: "fitz.Pixmap",
+    offset_x: int,
+    offset_y: int,
+    top: int,
+    bottom: int,
+    width: int,
+    n: int,
+    alpha: bool,
+) -> memoryview:
+    """
+    Crop or pad a band pixmap placed at (offset_x, offset_y) to rows top..bottom
+    and width columns. Missing pixels are white, or transparent with alpha.
+    """
+    row_bytes = width * n
+    band = bytearray((b"\x00" if alpha else b"\xff") * (row_bytes * (bottom - top)))
+    samples = pix.samples_mv
+    col_start = max(0, offset_x)
+    col_end = min(width, offset_x + pix.width)
+    if col_end > col_start:
+        src_x = (col_start - offset_x) * n
+        count = (col_end - col_start) * n
+        for y in range(max(top, offset_y), min(bottom, offset_y + pix.height)):
+            src = (y - offset_y) * pix.stride + src_x
+            dst = (y - top) * row_bytes + col_start * n
+            band[dst:dst + count] = samples[src:src + count]
+    return memoryview(band)
 
-    return total_pages
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+# (colour components, alpha) -> PNG colour type
+_PNG_COLOUR_TYPES = {(1, False): 0, (1, True): 4, (3, False): 2, (3, True): 6}
+
+
+def _save_png_banded(
+    page: "fitz.Page", matrix: "fitz.Matrix", f: BinaryIO, fmt: _ExportFormat
+) -> None:
+    """
+    Write page to f as a PNG, streaming each rendered band into the compressor.
+    Peak memory is bounded by the band size, not by the page area.
+    Dithered bilevel output needs the whole page and is not handled here.
+    """
+    irect = (page.rect * matrix).irect
+    width, height = irect.width, irect.height
+    n = fmt.fitz_colorspace.n
+    if fmt.colorspace == "bilevel":
+        bit_depth, colour_type, stride = 1, 0, (width + 7) // 8
+    else:
+        bit_depth, colour_type = 8, _PNG_COLOUR_TYPES[(n, fmt.alpha)]
+        stride = width * (n + fmt.alpha)
+    compressor = zlib.compressobj(6)
+    pixels_per_meter = round(fmt.dpi / 0.0254)
+    f.write(b"\x89PNG\r\n\x1a\n")
+    f.write(_png_chunk(
+        b"IHDR", struct.pack(">IIBBBBB", width, height, bit_depth, colour_type, 0, 0, 0)
+    ))
+    f.write(_png_chunk(b"pHYs", struct.pack(">IIB", pixels_per_meter, pixels_per_meter, 1)))
+    for _, rows, samples in _iter_page_bands(page, matrix, fmt.fitz_colorspace, fmt.alpha):
+        if fmt.colorspace == "bilevel":
+            # العتبة تُطبَّق على كل بكسل وحده، فالنتيجة لا تتأثر بحدود الشرائط
+            band = Image.frombytes("L", (width, rows), samples)
+            samples = _to_bilevel(band, fmt).tobytes()
+        elif fmt.alpha:
+            # PNG يحتاج الشفافية غير مضروبة في الألوان
+            samples = _samples_to_image(samples, (width, rows), n, True).tobytes()
+        # كل سطر يبدأ ببايت نوع المرشح (0 = بدون مرشح)
+        data = bytearray()
+        for offset in range(0, rows * stride, stride):
+            data += b"\x00"
+            data += samples[offset:offset + stride]
+        f.write(_png_chunk(b"IDAT", compressor.compress(data)))
+    f.write(_png_chunk(b"IDAT", compressor.flush()))
+    f.write(_png_chunk(b"IEND", b""))
+
+
+def _render_page_banded(
+    page: "fitz.Page", matrix: "fitz.Matrix", colorspace: "fitz.Colorspace" = fitz.csRGB
+) -> Image.Image:
+    """Render page into a PIL image band by band, without a full-page pixmap."""
+    irect = (page.rect * matrix).irect
+    image = Image.new("RGB" if colorspace.n == 3 else "L", (irect.width, irect.height))
+    for top, rows, samples in _iter_page_bands(page, matrix, colorspace):
+        image.paste(_samples_to_image(samples, (irect.width, rows), colorspace.n, False), (0, top))
+    return image
+
+
+def _page_file_name(page_index: int, format_ext: str) -> str:
+    return f"page_{page_index + 1:03d}.{format_ext}"
+
+
+def _is_banded(page: "fitz.Page", scale: float) -> bool:
+    """True if page is too large at scale to be rendered in one pixmap."""
+    irect = (page.rect * fitz.Matrix(scale, scale)).irect
+    return irect.width * irect.height > BANDED_EXPORT_MIN_PIXELS
+
+
+def _write_page_image(page: "fitz.Page", f: BinaryIO, fmt: _ExportFormat) -> None:
+    """Render page and write it to the binary file object f as PNG or JPEG."""
+    matrix = fitz.Matrix(fmt.scale, fmt.scale)
+    dpi = (fmt.dpi, fmt.dpi)
+
+    if _is_banded(page, fmt.scale):
+        # صفحة ضخمة (لوحات كبيرة بدقة عالية): نرسمها على شرائط أفقية
+        if fmt.is_png and not (fmt.colorspace == "bilevel" and fmt.dither):
+            _save_png_banded(page, matrix, f, fmt)
+            return
+        # التنقيط ينقل الخطأ من سطر إلى الذي يليه، فيحتاج الصفحة كاملة:
+        # نجمع الشرائط في صورة رمادية (بايت لكل بكسل) ثم ننقّطها مرة واحدة
+        image = _render_page_banded(page, matrix, fmt.fitz_colorspace)
+    else:
+        # الرمادي والأبيض والأسود يُرسمان بقناة واحدة مباشرة: ثلث الذاكرة والوقت
+        pix = page.get_pixmap(matrix=matrix, colorspace=fmt.fitz_colorspace, alpha=fmt.alpha)
+        if fmt.is_png and fmt.colorspace != "bilevel" and not fmt.alpha:
+            pix.set_dpi(*dpi)
+            f.write(pix.tobytes("png"))
+            return
+        # الترميز من عينات الصفحة مباشرة عبر Pillow (libjpeg-turbo)،
+        # وهو أسرع بكثير من مرمّز JPEG الخاص بـ PyMuPDF. الشفافية تمر من هنا
+        # أيضاً لتُزال من الألوان بنفس طريقة الشرائط
+        image = pixmap_to_image(pix)
+
+    if fmt.colorspace == "bilevel":
+        image = _to_bilevel(image, fmt)
+    if fmt.is_png:
+        image.save(f, "PNG", dpi=dpi)
+        return
+    if image.mode == "1":
+        image = image.convert("L")  # JPEG لا يدعم صور 1-bit
+    image.save(f, "JPEG", quality=fmt.jpeg_quality, dpi=dpi)
+
+
+class _HashingWriter:
+    """Binary file wrapper that tracks the size and content hash of what is written."""
+
+    def __init__(self, f: BinaryIO):
+        self._f = f
+        self._digest = cache_ops.new_content_hash()
+        self.size = 0
+
+    def write(self, data) -> int:
+        self._digest.update(data)
+        self.size += len(data)
+        return self._f.write(data)
+
+    def flush(self) -> None:
+        self._f.flush()
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+def _export_page_job(
+    doc, page_index: int, output_dir: str, fmt: _ExportFormat
+) -> Tuple[int, str, int, str]:
+    file_name = _page_file_name(page_index, fmt.format_ext)
+    img_path = os.path.join(output_dir, file_name)
+    try:
+        with open(img_path, "wb") as f:
+            writer = _HashingWriter(f)
+            _write_page_image(doc.load_page(page_index), writer, fmt)
+    except BaseException:
+        # لا نترك صورة ناقصة
+        try:
+            os.unlink(img_path)
+        except OSError:
+            pass
+        raise
+    return page_index, file_name, writer.size, writer.hexdigest()
+
+
+EXPORT_MANIFEST_NAME = ".export_manifest.jsonl"
+_EXPORT_MANIFEST_VERSION = 1
+
+
+class _ExportManifest:
+    """
+    Append-only record of the pages already exported to a folder, so that an
+    interrupted export can be resumed. The first line holds the source
+    fingerprint and export settings; each further line records one finished
+    page (file name, size, checksum). A manifest written with other settings
+    is discarded.
+    """
+
+    def __init__(self, output_dir: str, settings: Dict[str, Any]):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, EXPORT_MANIFEST_NAME)
+        self.header = {"version": _EXPORT_MANIFEST_VERSION, "settings": settings}
+        self._records: Dict[int, Dict[str, Any]] = {}
+        self._matches = False
+        self._file = None
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except (FileNotFoundError, UnicodeDecodeError):
+            return
+        try:
+            if not lines or json.loads(lines[0]) != self.header:
+                return
+        except ValueError:
+            return
+        self._matches = True
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+                self._records[int(record["page"])] = record
+            except (ValueError, KeyError, TypeError):
+                continue  # سطر ناقص من تصدير انقطع
+
+    def is_done(self, page_index: int) -> bool:
+        """True if the page's file is on disk with the recorded size and checksum."""
+        record = self._records.get(page_index)
+        if record is None:
+            return False
+        path = os.path.join(self.output_dir, record["file"])
+        try:
+            if os.path.getsize(path) != record["size"]:
+                return False
+            # بلا ذاكرة: آلاف الصور المصدَّرة لا تُزاحم بصمات ملفات PDF
+            return cache_ops.hash_file(path) == record["checksum"]
+        except OSError:
+            return False
+
+    def __enter__(self) -> "_ExportManifest":
+        if self._matches:
+            self._file = open(self.path, "a", encoding="utf-8")
+        else:
+            self._file = open(self.path, "w", encoding="utf-8")
+            self._file.write(json.dumps(self.header) + "\n")
+            self._file.flush()
+        return self
+
+    def add(self, page_index: int, file_name: str, size: int, checksum: str) -> None:
+        record = {"page": page_index, "file": file_name, "size": size, "checksum": checksum}
+        self._records[page_index] = record
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()  # كل صفحة مكتملة تُسجَّل فوراً
+
+    def __exit__(self, *exc) -> None:
+        self._file.close()
+        self._file = None
+
+
+def _export_to_folder(
+    pdf_path: str,
+    pages: List[int],
+    output_dir: str,
+    fmt: _ExportFormat,
+    workers: Optional[int],
+) -> int:
+    """Export pages to output_dir, skipping pages a previous run already finished."""
+    os.makedirs(output_dir, exist_ok=True)
+
+    settings = {"source": cache_ops.file_fingerprint(pdf_path), **fmt.settings()}
+    manifest = _ExportManifest(output_dir, settings)
+    todo = [p for p in pages if not manifest.is_done(p)]
+
+    with manifest:
+        for page_index, file_name, size, checksum in render_pages(
+            pdf_path,
+            todo,
+            _export_page_job,
+            (output_dir, fmt),
+            workers=workers,
+            scale=fmt.scale,
+        ):
+            manifest.add(page_index, file_name, size, checksum)
+
+    return len(pages)
+
+
+# Pages per worker task in ZIP export: encoded pages travel back to the
+# parent process, so only a few of them should be in flight at once
+_ZIP_CHUNK_PAGES = 2
+
+
+def _encode_page_job(
+    doc, page_index: int, fmt: _ExportFormat
+) -> Tuple[int, str, Optional[bytes]]:
+    page = doc.load_page(page_index)
+    name = _page_file_name(page_index, fmt.format_ext)
+    if _is_banded(page, fmt.scale):
+        # الصفحات الضخمة تُكتب داخل الأرشيف مباشرة في العملية الرئيسية
+        return page_index, name, None
+    buffer = io.BytesIO()
+    _write_page_image(page, buffer, fmt)
+    return page_index, name, buffer.getvalue()
+
+
+def export_pages_to_images(
+    pdf_path: str,
+    output_dir: str,
+    format_ext: str = "png",
+    dpi: int = 144,
+    workers: Optional[int] = None,
+    jpeg_quality: int = 85,
+    colorspace: str = "rgb",
+    alpha: bool = False,
+    threshold: int = 128,
+    dither: bool = False,
+) -> int:
+    """
+    Export all pages as images to output_dir. Returns number of pages exported.
+    format_ext: 'png' or 'jpg'. dpi controls rasterization quality.
+    workers: number of rendering processes (None = all cores, 1 = serial).
+    jpeg_quality: JPEG quality (1-100), ignored for PNG.
+    colorspace: 'rgb', 'gray' or 'bilevel' (1-bit, black where the gray level is
+    below threshold, or Floyd-Steinberg dithered when dither is set).
+    alpha: keep the page background transparent (PNG, rgb or gray only).
+    Finished pages are recorded in a manifest in output_dir; rerunning the
+    same export skips pages whose files are already there and intact.
+    """
+    fmt = _export_format(format_ext, dpi, jpeg_quality, colorspace, alpha, threshold, dither)
+
+    total_pages = probe(pdf_path)["page_count"]
+    return _export_to_folder(pdf_path, list(range(total_pages)), output_dir, fmt, workers)
 
 
 def export_selected_pages_to_images(
@@ -134,36 +981,91 @@ def export_selected_pages_to_images(
     output_dir: str,
     format_ext: str = "png",
     dpi: int = 144,
+    workers: Optional[int] = None,
+    jpeg_quality: int = 85,
+    colorspace: str = "rgb",
+    alpha: bool = False,
+    threshold: int = 128,
+    dither: bool = False,
 ) -> int:
     """
     Export only selected 0-based pages as images. Returns number of pages exported.
+    Options and resuming work like export_pages_to_images.
     """
     if not pages:
         raise ValueError("pages cannot be empty")
-    if format_ext not in ("png", "jpg", "jpeg"):
-        raise ValueError("format_ext must be png or jpg")
+    fmt = _export_format(format_ext, dpi, jpeg_quality, colorspace, alpha, threshold, dither)
 
-    os.makedirs(output_dir, exist_ok=True)
+    page_count = probe(pdf_path)["page_count"]
+    valid_pages = [p for p in sorted(set(pages)) if 0 <= p < page_count]
+    return _export_to_folder(pdf_path, valid_pages, output_dir, fmt, workers)
 
-    scale = dpi / 72
-    doc = fitz.open(pdf_path)
+
+def export_pages_to_zip(
+    pdf_path: str,
+    zip_path: str,
+    pages: Optional[List[int]] = None,
+    format_ext: str = "png",
+    dpi: int = 144,
+    workers: Optional[int] = None,
+    jpeg_quality: int = 85,
+    colorspace: str = "rgb",
+    alpha: bool = False,
+    threshold: int = 128,
+    dither: bool = False,
+    deflate: bool = False,
+) -> int:
+    """
+    Export pages as images straight into a ZIP archive. Returns number of pages exported.
+    pages: 0-based pages to export (default: all pages).
+    Images are encoded in memory and written to the archive in page order;
+    no per-page files touch the disk. deflate compresses the entries (PNG and
+    JPEG are already compressed, so by default they are stored). Other options
+    work like export_pages_to_images.
+    """
+    if pages is not None and not pages:
+        raise ValueError("pages cannot be empty")
+    fmt = _export_format(format_ext, dpi, jpeg_quality, colorspace, alpha, threshold, dither)
+
+    page_count = probe(pdf_path)["page_count"]
+    if pages is None:
+        valid_pages = list(range(page_count))
+    else:
+        valid_pages = [p for p in sorted(set(pages)) if 0 <= p < page_count]
+
+    compression = zipfile.ZIP_DEFLATED if deflate else zipfile.ZIP_STORED
     exported = 0
+    doc = None  # يُفتح فقط إذا وُجدت صفحات ضخمة
     try:
-        for page_index in sorted(set(pages)):
-            if 0 <= page_index < doc.page_count:
-                page = doc.load_page(page_index)
-                pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale))
-                file_name = f"page_{page_index + 1:03d}.{format_ext}"
-                img_path = os.path.join(output_dir, file_name)
-
-                if format_ext.lower() == "png":
-                    pix.save(img_path)
+        with zipfile.ZipFile(zip_path, "w", compression=compression) as archive:
+            for page_index, name, data in render_pages(
+                pdf_path,
+                valid_pages,
+                _encode_page_job,
+                (fmt,),
+                workers=workers,
+                chunk_size=_ZIP_CHUNK_PAGES,
+                scale=fmt.scale,
+            ):
+                if data is None:
+                    # الشرائط تُضغط مباشرة في مدخل الأرشيف دون نسخة كاملة في الذاكرة
+                    if doc is None:
+                        doc = fitz.open(pdf_path)
+                    with archive.open(name, "w", force_zip64=True) as entry:
+                        _write_page_image(doc.load_page(page_index), entry, fmt)
                 else:
-                    image = Image.open(io.BytesIO(pix.tobytes("png")))
-                    image.save(img_path, "JPEG", quality=85)
+                    archive.writestr(name, data)
                 exported += 1
+    except BaseException:
+        # أرشيف ناقص لا فائدة منه
+        try:
+            os.unlink(zip_path)
+        except OSError:
+            pass
+        raise
     finally:
-        doc.close()
+        if doc is not None:
+            doc.close()
 
     return exported
 
@@ -239,11 +1141,9 @@ def split_pdf_equal(
     if num_parts < 1:
         raise ValueError("num_parts must be >= 1")
 
-    src_doc = fitz.open(pdf_path)
-    total_pages = src_doc.page_count
+    total_pages = probe(pdf_path)["page_count"]
 
     if total_pages == 0:
-        src_doc.close()
         return 0
 
     pages_per_part = (total_pages + num_parts - 1) // num_parts
@@ -255,7 +1155,6 @@ def split_pdf_equal(
         if start < total_pages:
             ranges.append((start, end))
 
-    src_doc.close()
     return split_pdf_by_ranges(pdf_path, ranges, output_dir, base_name)
 
 
@@ -267,16 +1166,14 @@ def reorder_pages(pdf_path: str, new_order: List[int], output_path: str) -> int:
     if not new_order:
         raise ValueError("new_order cannot be empty")
 
-    src_doc = fitz.open(pdf_path)
-    dst_doc = fitz.open()
+    doc = fitz.open(pdf_path)
     try:
-        for page_index in new_order:
-            if 0 <= page_index < src_doc.page_count:
-                dst_doc.insert_pdf(src_doc, from_page=page_index, to_page=page_index)
-        dst_doc.save(output_path)
+        doc.select([p for p in new_order if 0 <= p < doc.page_count])
+        save_path = _save_target(pdf_path, output_path)
+        doc.save(save_path, garbage=2)
     finally:
-        src_doc.close()
-        dst_doc.close()
+        doc.close()
+    _commit_save(save_path, output_path)
 
     return len(new_order)
 
@@ -298,31 +1195,25 @@ def insert_pages_from_pdf(
 
     main_doc = fitz.open(pdf_path)
     insert_doc = fitz.open(insert_pdf_path)
-    new_doc = fitz.open()
 
     try:
-        # Copy pages before insert position
-        for i in range(insert_at):
-            if i < main_doc.page_count:
-                new_doc.insert_pdf(main_doc, from_page=i, to_page=i)
-
-        # Insert pages from the other PDF
         if pages_to_insert is None:
             pages_to_insert = list(range(insert_doc.page_count))
-        for page_idx in pages_to_insert:
-            if 0 <= page_idx < insert_doc.page_count:
-                new_doc.insert_pdf(insert_doc, from_page=page_idx, to_page=page_idx)
+        pages_to_insert = [p for p in pages_to_insert if 0 <= p < insert_doc.page_count]
 
-        # Copy remaining pages from main PDF
-        for i in range(insert_at, main_doc.page_count):
-            new_doc.insert_pdf(main_doc, from_page=i, to_page=i)
+        # Insert consecutive pages with one insert_pdf call per run
+        position = max(0, min(insert_at, main_doc.page_count))
+        for first, last in _page_runs(pages_to_insert):
+            main_doc.insert_pdf(insert_doc, from_page=first, to_page=last, start_at=position)
+            position += last - first + 1
 
-        new_doc.save(output_path)
-        total_pages = new_doc.page_count
+        save_path = _save_target(pdf_path, output_path)
+        main_doc.save(save_path)
+        total_pages = main_doc.page_count
     finally:
         main_doc.close()
         insert_doc.close()
-        new_doc.close()
+    _commit_save(save_path, output_path)
 
     return total_pages
 
@@ -339,26 +1230,17 @@ def insert_blank_page(
         output_path = pdf_path
 
     doc = fitz.open(pdf_path)
-    new_doc = fitz.open()
 
     try:
-        # Copy pages before insert position
-        for i in range(insert_at):
-            if i < doc.page_count:
-                new_doc.insert_pdf(doc, from_page=i, to_page=i)
-
-        # Insert blank page
-        new_doc.new_page(width=width, height=height, pno=insert_at)
+        position = max(0, min(insert_at, doc.page_count))
+        doc.new_page(pno=position if position < doc.page_count else -1, width=width, height=height)
 
-        # Copy remaining pages
-        for i in range(insert_at, doc.page_count):
-            new_doc.insert_pdf(doc, from_page=i, to_page=i)
-
-        new_doc.save(output_path)
-        total_pages = new_doc.page_count
+        save_path = _save_target(pdf_path, output_path)
+        doc.save(save_path)
+        total_pages = doc.page_count
     finally:
         doc.close()
-        new_doc.close()
+    _commit_save(save_path, output_path)
 
     return total_pages
 
@@ -501,11 +1383,7 @@ def get_pdf_metadata(pdf_path: str) -> dict:
     """
     Get PDF metadata. Returns dict with title, author, subject, keywords, etc.
     """
-    doc = fitz.open(pdf_path)
-    try:
-        return doc.metadata
-    finally:
-        doc.close()
+    return dict(probe(pdf_path)["metadata"])
 
 
 def extract_page_content(page) -> List[Dict[str, Any]]:
@@ -0,0 +1,288 @@
+import io
+
+import fitz  # PyMuPDF
+import pytest
+from PIL import Image
+
+import pdf_ops
+
+A0 = (2383.94, 3370.39)
+
+
+@pytest.mark.parametrize(
+    "colorspace, alpha",
+    [(fitz.csGRAY, False), (fitz.csRGB, False), (fitz.csRGB, True)],
+    ids=["gray", "rgb", "rgba"],
+)
+def test_bands_cover_a0_page_at_1200_dpi(colorspace, alpha):
+    doc = fitz.open()
+    page = doc.new_page(width=A0[0], height=A0[1])
+    page.insert_text((72, 72), "A0 drawing", fontsize=48)
+    matrix = fitz.Matrix(1200 / 72, 1200 / 72)
+    irect = (page.rect * matrix).irect
+    n = colorspace.n + alpha
+
+    next_top = 0
+    for top, rows, samples in pdf_ops._iter_page_bands(page, matrix, colorspace, alpha):
+        assert top == next_top
+        assert len(samples) == rows * irect.width * n
+        next_top = top + rows
+    assert next_top == irect.height
+
+
+def test_fit_band_crops_and_pads():
+    doc = fitz.open()
+    page = doc.new_page(width=40, height=30)
+    page.draw_rect((5, 5, 35, 25), color=None, fill=(0, 0, 0))
+    pix = page.get_pixmap(colorspace=fitz.csGRAY)
+    width = pix.width
+    full = bytes(pix.samples)
+
+    # الشريط المرسوم بدأ قبل المطلوب بسطر: نقص السطر الأول
+    band = pdf_ops._fit_band(pix, 0, -1, 0, 10, width, 1, False)
+    assert bytes(band) == full[width:11 * width]
+
+    # الشريط المرسوم بدأ بعد المطلوب بسطر: السطر الأول أبيض
+    band = pdf_ops._fit_band(pix, 0, 1, 0, 10, width, 1, False)
+    assert bytes(band) == b"\xff" * width + full[:9 * width]
+
+    # عمود زائد في البداية وسطر ناقص في النهاية مع الشفافية
+    pix = page.get_pixmap(colorspace=fitz.csGRAY, alpha=True)
+    band = pdf_ops._fit_band(pix, -1, 0, 25, 31, width - 1, 2, True)
+    stride = pix.stride
+    for y in range(25, 30):
+        row = bytes(band[(y - 25) * (width - 1) * 2:(y - 24) * (width - 1) * 2])
+        assert row == bytes(pix.samples[y * stride + 2:(y + 1) * stride])
+    assert bytes(band[5 * (width - 1) * 2:]) == b"\x00" * ((width - 1) * 2)
+
+
+def _sample_page():
+    doc = fitz.open()
+    page = doc.new_page(width=200, height=300)
+    page.insert_text((20, 40), "Banded export", fontsize=18)
+    page.draw_rect((30, 60, 170, 140), color=None, fill=(0.2, 0.5, 0.8))
+    page.draw_circle((100, 200), 60, color=None, fill=(0.9, 0.3, 0.1))
+    # صورة شفافة في المنتصف حتى تمر الشفافية عبر حدود الشرائط
+    overlay = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 64, 64), True)
+    overlay.set_rect(overlay.irect, (0, 128, 0, 96))
+    page.insert_image((40, 120, 160, 240), pixmap=overlay)
+    return doc, page
+
+
+def _export_bytes(monkeypatch, page, fmt, banded):
+    monkeypatch.setattr(pdf_ops, "BANDED_EXPORT_MIN_PIXELS", 0 if banded else 1 << 40)
+    # شرائط صغيرة جداً: عشرات الشرائط للصفحة الواحدة
+    monkeypatch.setattr(pdf_ops, "EXPORT_BAND_BYTES", 4096)
+    buf = io.BytesIO()
+    pdf_ops._write_page_image(page, buf, fmt)
+    buf.seek(0)
+    return Image.open(buf)
+
+
+@pytest.mark.parametrize(
+    "format_ext, colorspace, alpha, dither",
+    [
+        ("png", "rgb", False, False),
+        ("png", "gray", False, False),
+        ("png", "rgb", True, False),
+        ("png", "gray", True, False),
+        ("png", "bilevel", False, False),
+        ("png", "bilevel", False, True),
+        ("jpg", "rgb", False, False),
+        ("jpg", "bilevel", False, True),
+    ],
+)
+def test_banded_export_matches_full_page(monkeypatch, format_ext, colorspace, alpha, dither):
+    doc, page = _sample_page()
+    fmt = pdf_ops._export_format(format_ext, 150, 90, colorspace, alpha, 128, dither)
+
+    banded = _export_bytes(monkeypatch, page, fmt, banded=True)
+    full = _export_bytes(monkeypatch, page, fmt, banded=False)
+    assert banded.mode == full.mode
+    assert banded.size == full.size
+    assert banded.tobytes() == full.tobytes()
+
+
+def test_banded_export_hairlines_stay_close(monkeypatch):
+    # MuPDF يقص حواف الخطوط الرفيعة عند كل شريط، فتنعيمها قد يختلف قليلاً
+    doc = fitz.open()
+    page = doc.new_page(width=200, height=300)
+    for i in range(30):
+        page.draw_line((10, 10 + i * 9.3), (190, 290 - i * 7.1), width=0.3)
+    fmt = pdf_ops._export_format("png", 150, 90, "gray", False, 128, False)
+
+    banded = _export_bytes(monkeypatch, page, fmt, banded=True)
+    full = _export_bytes(monkeypatch, page, fmt, banded=False)
+    assert banded.size == full.size
+    diff = max(abs(a - b) for a, b in zip(banded.tobytes(), full.tobytes()))
+    assert diff <= 32
+
+
+def test_export_settings_only_hold_fields_of_the_format():
+    png = pdf_ops._export_format("png", 150, 85, "rgb", False, 128, False)
+    assert png.settings() == pdf_ops._export_format("png", 150, 40, "rgb", False, 90, True).settings()
+    assert "jpeg_quality" not in png.settings()
+
+    jpg = pdf_ops._export_format("jpg", 150, 85, "gray", False, 128, False)
+    assert jpg.settings()["jpeg_quality"] == 85
+    assert "alpha" not in jpg.settings()
+
+    dithered = pdf_ops._export_format("png", 150, 85, "bilevel", False, 128, True)
+    assert "threshold" not in dithered.settings()
+    assert pdf_ops._export_format("png", 150, 85, "bilevel", False, 100, False).settings() != (
+        pdf_ops._export_format("png", 150, 85, "bilevel", False, 128, False).settings()
+    )
+
+
+def _text_pdf(path, page_count):
+    doc = fitz.open()
+    for i in range(page_count):
+        doc.new_page(width=200, height=300).insert_text((20, 40), f"page {i + 1}")
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def test_render_pages_shares_one_pool_across_batch_sizes(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_ops, "PARALLEL_MIN_PIXELS", 0)
+    try:
+        pools = set()
+        for page_count in (8, 9, 10):
+            pdf_path = _text_pdf(tmp_path / f"{page_count}.pdf", page_count)
+            results = pdf_ops.render_pages(
+                pdf_path, list(range(page_count)), pdf_ops._thumbnail_job, (0.2,),
+                workers=3, scale=0.2,
+            )
+            assert [page_index for page_index, _ in results] == list(range(page_count))
+            pools.add(id(pdf_ops.get_process_pool(3)))
+        assert len(pools) == 1
+    finally:
+        pdf_ops.shutdown_process_pool()
+    assert pdf_ops._pool is None
+
+
+def test_probe_does_not_hash_the_file(tmp_path, monkeypatch):
+    def no_hash(path):
+        raise AssertionError("probe must not read the whole file")
+
+    monkeypatch.setattr(pdf_ops.cache_ops, "file_fingerprint", no_hash)
+    monkeypatch.setattr(pdf_ops, "PROBE_CACHE_SIZE", 2)
+    paths = [_text_pdf(tmp_path / f"{i}.pdf", i + 1) for i in range(3)]
+    assert [pdf_ops.probe(p)["page_count"] for p in paths] == [1, 2, 3]
+    assert len(pdf_ops._probe_cache) == 2
+
+    # ملف تغيّر على القرص يُقرأ من جديد
+    _text_pdf(paths[2], 5)
+    assert pdf_ops.probe(paths[2])["page_count"] == 5
+
+
+def _labelled_pdf(path, page_count, rotations=None):
+    """Pages carry their 1-based number as text so the output order can be read back."""
+    doc = fitz.open()
+    for i in range(page_count):
+        page = doc.new_page(width=200, height=300)
+        page.insert_text((20, 40), f"page {i + 1}")
+        if rotations and i in rotations:
+            page.set_rotation(rotations[i])
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def _page_labels_and_rotations(pdf_path):
+    doc = fitz.open(pdf_path)
+    try:
+        return [(page.get_text().strip(), page.rotation) for page in doc]
+    finally:
+        doc.close()
+
+
+def test_edit_plan_rotates_by_original_index_after_reorder(tmp_path):
+    src = _labelled_pdf(tmp_path / "in.pdf", 4, rotations={2: 90})
+    out = str(tmp_path / "out.pdf")
+    plan = pdf_ops.EditPlan(page_order=[2, 0, 3, 1], rotations={2: 90, 1: 270})
+
+    assert pdf_ops.apply_edit_plan(src, plan, out) == 4
+    assert _page_labels_and_rotations(out) == [
+        ("page 3", 180), ("page 1", 0), ("page 4", 0), ("page 2", 270),
+    ]
+
+
+def test_edit_plan_deletes_and_rotates(tmp_path):
+    src = _labelled_pdf(tmp_path / "in.pdf", 5)
+    out = str(tmp_path / "out.pdf")
+    plan = pdf_ops.EditPlan(deleted={0, 3}, rotations={1: 90, 3: 180, 4: -90})
+
+    assert pdf_ops.apply_edit_plan(src, plan, out) == 3
+    assert _page_labels_and_rotations(out) == [("page 2", 90), ("page 3", 0), ("page 5", 270)]
+
+
+def test_edit_plan_compress(tmp_path):
+    src = _labelled_pdf(tmp_path / "in.pdf", 3)
+    out = str(tmp_path / "out.pdf")
+
+    assert pdf_ops.apply_edit_plan(src, pdf_ops.EditPlan(deleted={1}, compress=True), out) == 2
+    assert _page_labels_and_rotations(out) == [("page 1", 0), ("page 3", 0)]
+    doc = fitz.open(out)
+    try:
+        # deflate=True يضغط كل تيارات المحتوى
+        for page in doc:
+            for xref in page.get_contents():
+                assert doc.xref_get_key(xref, "Filter")[1] == "/FlateDecode"
+    finally:
+        doc.close()
+
+
+def test_edit_plan_saves_over_its_source(tmp_path):
+    src = _labelled_pdf(tmp_path / "in.pdf", 3)
+    plan = pdf_ops.EditPlan(page_order=[2, 1, 0], deleted={1}, rotations={0: 90})
+
+    assert pdf_ops.apply_edit_plan(src, plan, src) == 2
+    assert _page_labels_and_rotations(src) == [("page 3", 0), ("page 1", 90)]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["in.pdf"]
+
+
+def test_edit_plan_without_pages_is_rejected(tmp_path):
+    src = _labelled_pdf(tmp_path / "in.pdf", 2)
+    out = tmp_path / "out.pdf"
+
+    with pytest.raises(ValueError):
+        pdf_ops.apply_edit_plan(src, pdf_ops.EditPlan(deleted={0, 1}), str(out))
+    with pytest.raises(ValueError):
+        pdf_ops.apply_edit_plan(src, pdf_ops.EditPlan(page_order=[]), str(out))
+    assert not out.exists()
+
+
+def test_export_resumes_from_manifest(tmp_path, monkeypatch):
+    src = _labelled_pdf(tmp_path / "in.pdf", 4)
+    out = tmp_path / "pages"
+    rendered = []
+    export_page_job = pdf_ops._export_page_job
+
+    def recording_job(doc, page_index, *args):
+        rendered.append(page_index)
+        return export_page_job(doc, page_index, *args)
+
+    monkeypatch.setattr(pdf_ops, "_export_page_job", recording_job)
+
+    def export(**options):
+        rendered.clear()
+        pdf_ops.export_pages_to_images(src, str(out), "png", dpi=36, workers=1, **options)
+        return rendered
+
+    assert export() == [0, 1, 2, 3]
+    assert export() == []  # كل الصفحات مسجلة وسليمة
+
+    (out / "page_002.png").unlink()
+    with open(out / "page_004.png", "ab") as f:
+        f.write(b"\0")  # حجم مختلف
+    assert export() == [1, 3]
+    # فحص الصور لا يملأ ذاكرة بصمات الملفات
+    assert not any(path.endswith(".png") for path in pdf_ops.cache_ops._fingerprints)
+
+    # الجودة لا تؤثر في PNG؛ تغيير نظام الألوان يُسقط السجل كله
+    assert export(jpeg_quality=20) == []
+    assert export(colorspace="gray") == [0, 1, 2, 3]
+
+    _labelled_pdf(src, 4, rotations={0: 90})  # المصدر تغيّر
+    assert export(colorspace="gray") == [0, 1, 2, 3]